@@ -0,0 +1,204 @@
+"""
+    benchmark.py
+
+    Author: Fabio Condomitti
+"""
+import argparse
+import importlib
+import inspect
+import json
+import os
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+
+from metrics import percentile
+from puzzle_io import iter_puzzles
+from solver import BACKENDS, NODE_LIMIT, TIMEOUT, Board, SolveResult, solve
+
+DIM = 9
+CORPORA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpora')
+CORPORA = ('easy', 'hard', '17clue', 'adversarial')
+SLOW = 1.0                        # s: a puzzle that takes longer than this is not run again
+TIMEOUT_S = 2.0                   # s: default time given to each puzzle before it is counted as stopped
+
+
+def load_entry(name, timeout=None, max_nodes=None):
+    """
+    Returns the solver entry point to benchmark: the name of a backend of solver.solve, or 'module:function'
+    for any function called as function(grid, DIM) with a 9x9 list, like solver.solve. The timeout and
+    max_nodes budget of each puzzle is passed to the backends and to the functions that take them
+    :param name: string
+    :param timeout: float or None -> s
+    :param max_nodes: int or None
+    :return: function
+    """
+    budget = {'timeout': timeout, 'max_nodes': max_nodes}
+    if(name in BACKENDS):
+        return lambda gr, DIM: solve(gr, DIM, backend=name, **budget)
+    module, sep, function = name.partition(':')
+    if(not sep):
+        raise ValueError('unknown entry point {0}: use a backend ({1}) or module:function'.format(
+            name, ', '.join(BACKENDS)))
+    entry = getattr(importlib.import_module(module), function)
+    try:
+        signature = inspect.signature(entry)
+    except (TypeError, ValueError):     # no signature to check (some builtins): call it as it is
+        return entry
+    try:
+        signature.bind(None, DIM)
+    except TypeError:
+        raise ValueError('{0} cannot be called as function(grid, DIM)'.format(name))
+    if(all(key in signature.parameters for key in budget)):
+        return lambda gr, DIM: entry(gr, DIM, **budget)
+    return entry
+
+def corpus_path(name):
+    """
+    Returns the file of a corpus: the name of one of the corpora shipped in corpora/, or the path of any
+    puzzle file
+    :param name: string
+    :return: string
+    """
+    if(name in CORPORA):
+        return os.path.join(CORPORA_DIR, name + '.txt')
+    return name
+
+def run_corpus(entry, puzzles, repeat, memory=True):
+    """
+    Times the entry point on every puzzle, keeping the best of repeat runs for each of them (a single run for
+    the puzzles slower than SLOW seconds). The puzzles stopped by the timeout or the node budget are counted
+    apart and left out of the latency percentiles, which would otherwise only show the budget. With memory
+    the corpus is run once more under tracemalloc, which slows the solver down a lot, to measure the peak
+    of memory it allocates on this corpus alone
+    :param entry: function
+    :param puzzles: list of bytes
+    :param repeat: int
+    :param memory: bool
+    :return: dict
+    """
+    times = []
+    solved = 0
+    stopped = 0
+    stopped_time = 0.0
+    for cells in puzzles:
+        best = None
+        for r in range(0, repeat):
+            gr = Board(bytearray(cells)).to_grid()
+            start = time.perf_counter()
+            ok = entry(gr, DIM)
+            elapsed = time.perf_counter() - start
+            if(best is None or elapsed < best):
+                best = elapsed
+            if(elapsed > SLOW):
+                break
+        if(isinstance(ok, SolveResult) and ok.status in (TIMEOUT, NODE_LIMIT)):
+            stopped += 1
+            stopped_time += best
+            continue
+        times.append(best)
+        if(ok):
+            solved += 1
+
+    peak = None
+    if(memory):
+        tracemalloc.start()
+        for cells in puzzles:
+            entry(Board(bytearray(cells)).to_grid(), DIM)
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+    ordered = sorted(times)
+    total = sum(times) + stopped_time
+    return {
+        'puzzles': len(puzzles),
+        'solved': solved,
+        'stopped': stopped,
+        'total_s': total,
+        'mean_ms': sum(times) / len(times) * 1e3 if times else 0.0,
+        'p50_ms': percentile(ordered, 50) * 1e3,
+        'p95_ms': percentile(ordered, 95) * 1e3,
+        'max_ms': (ordered[-1] if ordered else 0.0) * 1e3,
+        'throughput': len(puzzles) / total if total else 0.0,
+        'peak_kib': peak,
+        'times_ms': [t * 1e3 for t in times],
+    }
+
+def git_commit():
+    """
+    Returns the commit of the working tree, so that the runs of different commits can be told apart
+    :return: string or None
+    """
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+def main():
+    parser = argparse.ArgumentParser(description='Sudoku solver benchmark')
+    parser.add_argument('-e', '--entry', action='append', help='backend of solver.solve or module:function called '
+                        'as function(grid, DIM); repeat it to rank several entry points (default: every backend)')
+    parser.add_argument('-c', '--corpus', action='append', help='one of {0} or the path of a puzzle file; can be '
+                        'repeated (default: all the shipped corpora)'.format(', '.join(CORPORA)))
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='runs of each puzzle, the best one is kept (default: 3)')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='skip the run under tracemalloc that '
+                        'measures the peak of memory allocated by the solver on each corpus')
+    parser.add_argument('-t', '--timeout', type=float, default=TIMEOUT_S, help='stop a puzzle after this many seconds '
+                        'and count it as stopped (default: {0}, 0 for no timeout)'.format(TIMEOUT_S))
+    parser.add_argument('-n', '--max-nodes', type=int, help='stop a puzzle after this many guesses and count it as stopped')
+    parser.add_argument('-j', '--json', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    if(args.repeat < 1):
+        parser.error('repeat must be positive')
+    if(args.timeout < 0 or (args.max_nodes is not None and args.max_nodes < 0)):
+        parser.error('timeout and max nodes must not be negative')
+    entries = args.entry or list(BACKENDS)
+    corpora = args.corpus or list(CORPORA)
+    try:
+        solvers = [(name, load_entry(name, args.timeout or None, args.max_nodes)) for name in entries]
+        data = [(name, list(iter_puzzles(corpus_path(name)))) for name in corpora]
+    except (OSError, ValueError, ImportError, AttributeError) as e:
+        parser.error(str(e))
+
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': args.repeat,
+        'timeout': args.timeout or None,
+        'max_nodes': args.max_nodes,
+        'entries': {},
+    }
+    print('{0:<12} {1:<12} {2:>7} {3:>7} {4:>7} {5:>10} {6:>10} {7:>10} {8:>12} {9:>10}'.format(
+        'entry', 'corpus', 'puzzles', 'solved', 'stopped', 'p50 ms', 'p95 ms', 'max ms', 'puzzles/s', 'peak KiB'))
+    for entry_name, entry in solvers:
+        results['entries'][entry_name] = {}
+        for corpus_name, puzzles in data:
+            r = run_corpus(entry, puzzles, args.repeat, args.memory)
+            results['entries'][entry_name][corpus_name] = r
+            print('{0:<12} {1:<12} {2:>7} {3:>7} {4:>7} {5:>10.3f} {6:>10.3f} {7:>10.3f} {8:>12.1f} {9:>10}'.format(
+                entry_name, corpus_name, r['puzzles'], r['solved'], r['stopped'], r['p50_ms'], r['p95_ms'],
+                r['max_ms'], r['throughput'], '{0:.1f}'.format(r['peak_kib']) if args.memory else '-'), flush=True)
+
+    # the resident memory is only known for the whole process, which has run every entry point on every corpus
+    results['process_max_rss_kib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print('Max RSS of the benchmark process: {0} KiB'.format(results['process_max_rss_kib']))
+
+    # ranking of the entry points by the total time spent on the same puzzles
+    if(len(solvers) > 1):
+        totals = sorted((sum(r['total_s'] for r in results['entries'][name].values()), name) for name, e in solvers)
+        print('\nRanking by total time:')
+        for n, (total, name) in enumerate(totals):
+            print('{0}. {1:<12} {2:.3f} s'.format(n + 1, name, total))
+
+    if(args.json):
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+    client.py
+
+    Author: Fabio Condomitti
+"""
+import argparse
+import asyncio
+import json
+import socket
+import time
+
+from collections import Counter
+from itertools import cycle
+from benchmark import corpus_path
+from metrics import percentile
+from puzzle_io import VAL_TO_CHAR, iter_puzzles
+from server import HOST, LINE_LIMIT, OPS, PORT
+
+
+class Client:
+    """
+    This class is a blocking client of the solving service, for tools that send one request at a time
+    """
+    def __init__(self, unix=None, host=HOST, port=PORT):
+        """
+        Client constructor: connects to the Unix socket if its path is given, to the TCP port otherwise
+        :param unix: string or None
+        :param host: string
+        :param port: int
+        :return: None
+        """
+        if(unix):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(unix)
+        else:
+            self.sock = socket.create_connection((host, port))
+        self.file = self.sock.makefile('rwb')
+
+    def request(self, op='solve', puzzle=None, **options):
+        """
+        Sends a request and waits for its reply
+        :param op: string -> 'solve', 'unique', 'validate' or 'stats'
+        :param puzzle: string or list -> 81 characters or a list of rows
+        :param options: timeout, max_nodes and backend of a solve request
+        :return: dict
+        """
+        request = dict(options, op=op)
+        if(puzzle is not None):
+            request['puzzle'] = puzzle
+        self.file.write(json.dumps(request).encode() + b'\n')
+        self.file.flush()
+        line = self.file.readline()
+        if(not line):
+            raise ConnectionError('the server closed the connection')
+        return json.loads(line)
+
+    def close(self):
+        """
+        Closes the connection
+        :return: None
+        """
+        self.file.close()
+        self.sock.close()
+
+async def connect(unix, host, port):
+    """
+    Opens an asyncio connection to the service
+    :param unix: string or None
+    :param host: string
+    :param port: int
+    :return: (asyncio.StreamReader, asyncio.StreamWriter)
+    """
+    if(unix):
+        return await asyncio.open_unix_connection(unix, limit=LINE_LIMIT)
+    return await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+
+async def load_connection(unix, host, port, requests, depth, latencies, outcomes):
+    """
+    Sends its share of the requests on one connection, keeping up to depth of them in flight, and records
+    the latency and the outcome of each reply
+    :param unix: string or None
+    :param host: string
+    :param port: int
+    :param requests: list of dict
+    :param depth: int
+    :param latencies: list of float
+    :param outcomes: Counter
+    :return: None
+    """
+    reader, writer = await connect(unix, host, port)
+    window = asyncio.Semaphore(depth)
+    sent = {}
+
+    async def receive():
+        for n in range(0, len(requests)):
+            reply = json.loads(await reader.readline())
+            sent_at = sent.pop(reply.get('id'), None)      # None for a reply without id (a parse error)
+            if(sent_at is not None):
+                latencies.append(time.perf_counter() - sent_at)
+            outcomes[reply.get('error') or reply.get('status') or 'ok'] += 1
+            window.release()
+
+    receiver = asyncio.create_task(receive())
+    for request in requests:
+        await window.acquire()
+        sent[request['id']] = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b'\n')
+        await writer.drain()
+    await receiver
+    writer.close()
+
+async def load(unix, host, port, puzzles, total, connections, depth, op, timeout=None):
+    """
+    Generates load on the service: total requests over several connections, each with up to depth of them
+    in flight, cycling over the puzzles. Prints the requests/sec, the latency percentiles seen by the
+    client and the stats of the server
+    :param unix: string or None
+    :param host: string
+    :param port: int
+    :param puzzles: list of bytes
+    :param total: int
+    :param connections: int
+    :param depth: int
+    :param op: string
+    :param timeout: float or None -> s, timeout of each solve request
+    :return: None
+    """
+    requests = []
+    for n, cells in zip(range(0, total), cycle(puzzles)):
+        request = {'id': n, 'op': op, 'puzzle': cells.translate(VAL_TO_CHAR).decode('ascii')}
+        if(timeout is not None):
+            request['timeout'] = timeout
+        requests.append(request)
+
+    latencies = []
+    outcomes = Counter()
+    start = time.perf_counter()
+    await asyncio.gather(*[load_connection(unix, host, port, requests[c::connections], depth, latencies, outcomes)
+                           for c in range(0, connections)])
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    print('{0} requests in {1:.3f} s over {2} connections (depth {3}): {4:.1f} requests/sec'.format(
+        total, elapsed, connections, depth, total / elapsed if elapsed else 0))
+    print('Latency ms: p50 {0:.3f}, p95 {1:.3f}, p99 {2:.3f}, max {3:.3f}'.format(
+        percentile(ordered, 50) * 1e3, percentile(ordered, 95) * 1e3, percentile(ordered, 99) * 1e3,
+        (ordered[-1] if ordered else 0.0) * 1e3))
+    print('Replies: {0}'.format(', '.join('{0} {1}'.format(k, v) for k, v in sorted(outcomes.items()))))
+
+    reader, writer = await connect(unix, host, port)
+    writer.write(b'{"op": "stats"}\n')
+    stats = json.loads(await reader.readline())
+    writer.close()
+    print('Server: {0} requests, queue depth {1}, {2} batches of {3:.1f} requests on average, latency ms p50 {4:.3f}, p99 {5:.3f}'.format(
+        stats['requests'], stats['queue_depth'], stats['batches'], stats['mean_batch'],
+        stats['latency_ms']['p50'], stats['latency_ms']['p99']))
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generator of the sudoku solving service')
+    parser.add_argument('-u', '--unix', help='path of the Unix socket of the server (default: TCP)')
+    parser.add_argument('--host', default=HOST, help='TCP address of the server (default: {0})'.format(HOST))
+    parser.add_argument('-p', '--port', type=int, default=PORT, help='TCP port (default: {0})'.format(PORT))
+    parser.add_argument('-c', '--corpus', default='hard', help='shipped corpus or puzzle file whose puzzles are sent (default: hard)')
+    parser.add_argument('-n', '--requests', type=int, default=10000, help='number of requests (default: 10000)')
+    parser.add_argument('-k', '--connections', type=int, default=4, help='concurrent connections (default: 4)')
+    parser.add_argument('-d', '--depth', type=int, default=32, help='requests in flight on each connection (default: 32)')
+    parser.add_argument('-o', '--op', choices=[op for op in OPS if op != 'stats'], default='solve', help='request sent (default: solve)')
+    parser.add_argument('-t', '--timeout', type=float, help='timeout of each solve request in seconds')
+    args = parser.parse_args()
+
+    if(args.requests < 1 or args.connections < 1 or args.depth < 1):
+        parser.error('requests, connections and depth must be positive')
+    try:
+        puzzles = list(iter_puzzles(corpus_path(args.corpus)))
+        if(not puzzles):
+            parser.error('no puzzles found in {0}'.format(args.corpus))
+        asyncio.run(load(args.unix, args.host, args.port, puzzles, args.requests, min(args.connections, args.requests),
+                         args.depth, args.op, args.timeout))
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,734 @@
+"""
+    game.py
+
+    Author: Fabio Condomitti
+"""
+import os
+
+from hints import find_hint
+from solver import (INVALID, SOLVED, UNSOLVABLE, Board, SolutionCache, SolveStats, count_solutions, find_contradiction,
+                    geometry, solve)
+
+DIM = 9
+STORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpora', 'random.sdb')   # puzzles of the Random button
+CHECK_TIMEOUT = 5.0         # s given to the worker to tell whether the values of the user leave a solution
+CHECKING = 'Checking the values...'
+
+current_job = None          # shared counters of the worker process: the number of the job the game still wants
+current_check = None        # and of the board check the hint still wants
+
+
+class JobToken:
+    """
+    Cancellation token of a worker job: it is set as soon as the game moves on to another job, or for the
+    board checks to another board
+    """
+    def __init__(self, job, check=False):
+        """
+        JobToken constructor
+        :param job: int
+        :param check: bool -> the job is a board check of the hint
+        :return: None
+        """
+        self.job = job
+        self.check = check
+
+    def is_set(self):
+        counter = current_check if self.check else current_job
+        return counter is not None and counter.value != self.job
+
+
+def init_worker(job_counter, check_counter):
+    """
+    Initializer of the worker process: keeps the counters shared with the game
+    :param job_counter: multiprocessing.Value
+    :param check_counter: multiprocessing.Value
+    :return: None
+    """
+    global current_job, current_check
+    current_job = job_counter
+    current_check = check_counter
+
+
+def solve_givens(givens, job=None):
+    """
+    Worker job: solves the fixed grid collecting the solver stats, then tells whether the solution is the
+    only one. The search stops as soon as the game starts another job
+    :param givens: Board
+    :param job: int or None
+    :return: (Board or None, int, SolveStats, bool or None) -> solution, status of the solver, stats and
+             uniqueness (None if unknown)
+    """
+    stats = SolveStats()
+    board = givens.copy()
+    token = JobToken(job) if job is not None else None
+    result = solve(board, board.dim, stats=stats, cancel=token)
+    if(not result):
+        return None, result.status, stats, None
+    n = count_solutions(givens, 2, cancel=token)
+    return board, result.status, stats, (n == 1) if n is not None else None
+
+
+def count_board(board, limit, cancel=None, timeout=None):
+    """
+    Worker job: counts the solutions of a board up to limit, giving up after timeout seconds or as soon as
+    the cancel token is set
+    :param board: Board
+    :param limit: int
+    :param cancel: JobToken or None
+    :param timeout: float or None -> s
+    :return: int or None -> the solutions, None if the count gave up
+    """
+    return count_solutions(board, limit, timeout=timeout, cancel=cancel)
+
+
+class Cell:
+    """
+    This class holds the state of a single cell of the game: its values and how it is highlighted
+    """
+    # attributes that change the look of the cell: setting one of them to a new value marks the cell as dirty
+    VISUAL = frozenset(('val', 'temp', 'is_grid', 'selected', 'help_cells_highlight', 'same_number_highlight',
+                        'same_number_exists', 'correct', 'marks'))
+
+    def __init__(self, row, col, val):
+        """
+        Cell constructor
+        :param row: int
+        :param col: int
+        :param val: int
+        :return: None
+        """
+        self.row = row
+        self.col = col
+        self.val = val
+        self.temp = 0                       # temporary value
+        self.is_grid = False                # immutable or can be changed during game
+        self.selected = False
+        self.help_cells_highlight = False   # to highlight horizontal, vertical and box around cells
+        self.same_number_highlight = False  # to highlight errors
+        self.same_number_exists = False     # to highlight other number with a given value
+        self.correct = 0                    # green in sudoku correctly solved, red otherwise
+        self.marks = 0                      # pencil marks shown in the cell, as a candidate mask
+        self.dirty = True                   # changed since the view last drew it
+
+    def __setattr__(self, name, value):
+        if(name in Cell.VISUAL and getattr(self, name, None) != value):
+            object.__setattr__(self, 'dirty', True)
+        object.__setattr__(self, name, value)
+
+
+class Game:
+    """
+    This class handles the state of the whole grid without drawing it: values, moves, highlight and validation.
+    The grid is 9x9 unless another size with square boxes is given (16x16, 25x25...)
+    """
+    def __init__(self, row=DIM, col=DIM):
+        """
+        Game constructor
+        :param row: int
+        :param col: int -> the same as row
+        :return: None
+        """
+        if(row != col):
+            raise ValueError('a sudoku grid must be square, not {0}x{1}'.format(row, col))
+        self.row = row
+        self.col = col
+        self.geo = geometry(row)                    # units and peers of the cells
+        self.selected = None
+        self.cache = SolutionCache()                # solutions of the grids already checked
+        self.store = None                           # puzzle store of the Random button, False if it cannot be read
+        self.puzzles = None                         # puzzles generated in background when the store has none
+        self.givens = Board(None, row)              # the fixed grid, row by row
+        self.solution = None                        # its solution (a Board, False if it has none)
+        self.unique = None                          # the fixed grid has a single solution, None until it is known
+        self.solving = None                         # future of the solution being computed by the worker
+        self.counting = None                        # future of the uniqueness of a solution found in the cache
+        self.checking = None                        # future of the board check of the hint
+        self.board_check = None                     # (cells, solutions up to 1 or None if unknown) of the last board checked
+        self.stats = None                           # SolveStats of the worker run, None if the solver did not run
+        self.checked = False                        # the full grid has been checked
+        self.error = ''                             # why the grid entered by the user cannot be played
+        self.solver_pool = None                     # worker process, started at the first game
+        self.job = None                             # counter of the jobs shared with the worker, to cancel them
+        self.check_job = None                       # counter of the board checks shared with the worker
+        self.moves = []                             # values confirmed by the user, as [(i, j), val], to undo them
+
+        self.cubes = [[self.new_cell(i, j) for j in range(self.col)] for i in range(self.row)]
+        # the same cells in a flat list: cubes[i][j] is flat_cubes[i * col + j], the layout of the solver tables
+        self.flat_cubes = [cube for line in self.cubes for cube in line]
+
+        # indexes kept up to date by place(), with the flat indexes of the cells
+        self.digit_cells = [set() for d in range(0, row + 1)]                       # cells holding each digit
+        self.unit_counts = [[0] * (row + 1) for u in range(0, len(self.geo.units))]  # how many times a unit has a digit
+        self.filled = 0                             # cells with a value
+        self.conflicts = 0                          # cells whose value is repeated in one of their units
+        self.lit = []                               # cells highlighted around the selected one
+        self.unit_masks = [0] * len(self.geo.units)  # digits present in each unit
+        self.cand = [self.geo.full] * (row * col)   # candidates of every cell (digits missing from its units), 0 if it has a value
+        self.eliminated = [0] * (row * col)         # candidates removed by the hints, valid until a value is removed
+        self.show_marks = False                     # pencil marks drawn in the free cells
+        self.hint_text = ''                         # the last hint, explained
+
+    def new_cell(self, i, j):
+        """
+        This function creates the cell in position (i, j): a view can override it to create cells it can draw
+        :param i: int
+        :param j: int
+        :return: Cell
+        """
+        return Cell(i, j, 0)
+
+    def reset(self):
+        """
+        This function reset the temporary and the final values of every cell to play a game with the same grid
+        :return: None
+        """
+        for i in range(0, self.row):
+            for j in range(0, self.col):
+                if(not self.cubes[i][j].is_grid):
+                    self.cubes[i][j].temp = 0
+                    self.place(i, j, 0)
+                self.cubes[j][i].correct = 0
+        self.moves = []
+        self.checked = False
+        self.hint_text = ''
+
+    def new_game(self):
+        """
+        This function clear the status to play another game with a new grid
+        :return: None
+        """
+        for i in range(0, self.row):
+            for j in range(0, self.col):
+                    self.cubes[i][j].temp = 0
+                    self.place(i, j, 0)
+                    self.cubes[i][j].is_grid = False
+                    self.cubes[i][j].selected = False
+                    self.cubes[j][i].correct = False
+        self.selected = None
+        self.solution = None
+        self.unique = None
+        self.cancel_solving()
+        self.stats = None
+        self.moves = []
+        self.checked = False
+        self.error = ''
+        self.hint_text = ''
+        self.set_marks(False)
+
+    def fix_grid(self, solution=None):
+        """
+        This function fix the grid allowing the user to create a personal sudoku with an immutable grid and
+        starts solving it in background. A grid with repeated values, or one the propagation of the singles
+        proves unsolvable, is refused
+        :param solution: Board or None if it is not known yet
+        :return: bool -> False if the grid has been refused
+        """
+        givens = Board(None, self.row)
+        for i in range(0, self.row):
+            for j in range(0, self.col):
+                givens[j, i] = self.cubes[i][j].val
+        if(solution is None):
+            status = find_contradiction(givens)
+            if(status == INVALID):
+                self.error = 'Repeated values'
+                return False
+            if(status == UNSOLVABLE):
+                self.error = 'No solution'
+                return False
+        self.error = ''
+
+        self.givens = givens
+        self.unique = True if solution is not None else None     # the puzzles of the Random button are unique
+        for cube in self.flat_cubes:
+            if(cube.val != 0):
+                cube.is_grid = True
+        self.moves = []
+        self.start_solving(solution)
+        return True
+
+    def start_solving(self, solution=None):
+        """
+        This function looks the solution of the fixed grid up in the cache or hands the grid to the worker
+        process, so the game loop never waits for the solver. The worker also tells whether the solution is unique
+        :param solution: Board or None if it is not known yet
+        :return: None
+        """
+        self.cancel_solving()
+        self.stats = None
+        self.solution = solution if solution is not None else self.cache.lookup(self.givens)
+        if(self.solution is None):
+            self.solving = self.get_pool().submit(solve_givens, self.givens, self.job.value)
+        elif(self.solution and self.unique is None):
+            # a solution found in the cache: only its uniqueness is left to the worker
+            self.counting = self.get_pool().submit(count_board, self.givens, 2, JobToken(self.job.value))
+
+    def get_pool(self):
+        """
+        This function returns the worker process, starting it the first time
+        :return: ProcessPoolExecutor
+        """
+        if(self.solver_pool is None):
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            ctx = multiprocessing.get_context('spawn')
+            self.job = ctx.Value('i', 0)
+            self.check_job = ctx.Value('i', 0)
+            self.solver_pool = ProcessPoolExecutor(max_workers=1, mp_context=ctx, initializer=init_worker,
+                                                   initargs=(self.job, self.check_job))
+        return self.solver_pool
+
+    def cancel_solving(self):
+        """
+        This function stops the jobs of the worker process, if any: the worker notices it at its next guess
+        and becomes free for another grid
+        :return: None
+        """
+        if(self.solving is not None or self.counting is not None):
+            for future in (self.solving, self.counting):
+                if(future is not None):
+                    future.cancel()
+            with self.job.get_lock():
+                self.job.value += 1
+        self.solving = None
+        self.counting = None
+        self.cancel_check()
+        self.board_check = None
+
+    def cancel_check(self):
+        """
+        This function stops the board check of the hint, if any
+        :return: None
+        """
+        if(self.checking is not None):
+            self.checking.cancel()
+            with self.check_job.get_lock():
+                self.check_job.value += 1
+        self.checking = None
+
+    def check_board(self, board):
+        """
+        This function finds out whether the values on the board leave a solution: a contradiction found by
+        propagation answers at once, otherwise the worker counts the solutions within CHECK_TIMEOUT
+        :param board: Board
+        :return: None
+        """
+        self.cancel_check()
+        if(find_contradiction(board) is not None):
+            self.board_check = (bytes(board.cells), 0)
+        else:
+            self.board_check = (bytes(board.cells), None)
+            self.checking = self.get_pool().submit(count_board, board, 1, JobToken(self.check_job.value, True),
+                                                   CHECK_TIMEOUT)
+
+    def waiting(self):
+        """
+        This function tells whether a job of the worker process is in progress
+        :return: bool
+        """
+        return self.solving is not None or self.counting is not None or self.checking is not None
+
+    def poll_solution(self):
+        """
+        This function collects the solution, its uniqueness, the solver stats and the board checks computed by the
+        worker process, if they are ready. If the worker failed they stay unknown. A hint waiting for them is
+        given as soon as they come
+        :return: None
+        """
+        ready = False
+        if(self.solving is not None and self.solving.done()):
+            try:
+                solution, status, self.stats, unique = self.solving.result()
+            except Exception as e:
+                self.drop_worker(e)
+                return
+            if(status == SOLVED or status == UNSOLVABLE):
+                self.cache.store(self.givens, solution)
+            self.solution = solution if solution is not None else False
+            self.unique = unique
+            self.solving = None
+            ready = True
+        if(self.counting is not None and self.counting.done()):
+            try:
+                n = self.counting.result()
+            except Exception as e:
+                self.drop_worker(e)
+                return
+            self.unique = (n == 1) if n is not None else None
+            self.counting = None
+            ready = True
+        if(self.checking is not None and self.checking.done()):
+            try:
+                n = self.checking.result()
+            except Exception as e:
+                self.drop_worker(e)
+                return
+            self.board_check = (self.board_check[0], n)
+            self.checking = None
+            ready = True
+        if(ready and self.hint_text == CHECKING):
+            self.hint()
+
+    def drop_worker(self, e):
+        """
+        This function stops a worker process that died or failed: the game goes on without what it was computing,
+        a new worker is started for the next grid
+        :param e: Exception
+        :return: None
+        """
+        print('Solver unavailable: {0}'.format(e))
+        self.solving = None
+        self.counting = None
+        self.checking = None
+        self.solver_pool.shutdown(wait=False, cancel_futures=True)
+        self.solver_pool = None
+        self.error = 'Solver unavailable'
+        if(self.hint_text == CHECKING):
+            self.hint_text = ''
+
+    def close(self):
+        """
+        This function stops the worker processes without waiting for the grid being solved or the puzzles being generated
+        :return: None
+        """
+        self.cancel_solving()
+        if(self.solver_pool is not None):
+            self.solver_pool.shutdown(wait=False, cancel_futures=True)
+            self.solver_pool = None
+        if(self.store):
+            self.store.close()
+            self.store = None
+        if(self.puzzles is not None):
+            self.puzzles.close()
+            self.puzzles = None
+
+    def place(self, i, j, val):
+        """
+        This function writes the value of a cell, updating the indexes of the grid, the candidates and the conflicts
+        of the cells that share a unit with it
+        :param i: int
+        :param j: int
+        :param val: int
+        :return: None
+        """
+        k = i * self.col + j
+        old = self.flat_cubes[k].val
+        if(old == val):
+            return
+
+        if(old != 0):
+            self.digit_cells[old].discard(k)
+            bit = 1 << (old - 1)
+            for u in self.geo.cell_units[k]:
+                self.unit_counts[u][old] -= 1
+                if(self.unit_counts[u][old] == 0):
+                    self.unit_masks[u] &= ~bit
+            self.filled -= 1
+        if(val != 0):
+            self.digit_cells[val].add(k)
+            bit = 1 << (val - 1)
+            for u in self.geo.cell_units[k]:
+                self.unit_counts[u][val] += 1
+                self.unit_masks[u] |= bit
+            self.filled += 1
+        self.flat_cubes[k].val = val
+
+        # only the cell and its peers can change their candidates
+        self.update_cand(k)
+        for p in self.geo.peers[k]:
+            self.update_cand(p)
+        # the eliminations of the hints may rely on the removed value
+        if(old != 0 and any(self.eliminated)):
+            self.eliminated = [0] * len(self.eliminated)
+            self.set_marks(self.show_marks)
+
+        # only the peers holding the old or the new value can change their conflict state
+        self.mark_conflict(k)
+        for p in self.geo.peers[k]:
+            v = self.flat_cubes[p].val
+            if(v != 0 and (v == old or v == val)):
+                self.mark_conflict(p)
+
+    def update_cand(self, k):
+        """
+        This function computes again the candidates of a cell from the digits of its units, and its pencil marks if shown
+        :param k: int -> flat index of the cell
+        :return: None
+        """
+        cube = self.flat_cubes[k]
+        if(cube.val != 0):
+            c = 0
+        else:
+            row, col, box = self.geo.cell_units[k]
+            c = self.geo.full & ~(self.unit_masks[row] | self.unit_masks[col] | self.unit_masks[box])
+        self.cand[k] = c
+        if(self.show_marks):
+            cube.marks = c & ~self.eliminated[k]
+
+    def set_marks(self, show):
+        """
+        This function shows or hides the pencil marks: the candidates of every free cell, less the ones removed
+        by the hints
+        :param show: bool
+        :return: None
+        """
+        self.show_marks = show
+        for k, cube in enumerate(self.flat_cubes):
+            cube.marks = self.cand[k] & ~self.eliminated[k] if show else 0
+
+    def hint(self):
+        """
+        This function finds the next logical step from the pencil marks, after pointing out repeated values and
+        wrong values: on a grid with a single solution the values that differ from it, on a grid with several
+        solutions the values once they leave none. A digit to place is selected and shown as the temporary value
+        of its cell; candidates to remove are removed from the pencil marks, which are shown from then on.
+        What needs a search (the uniqueness of the grid, whether the values leave a solution) is left to the
+        worker process: until it answers the hint only says it is checking, and poll_solution() gives it then
+        :return: Hint or None if there is no step to show
+        """
+        if(self.conflicts):
+            self.hint_text = 'Repeated values: fix them first'
+            return None
+        if(self.solution):
+            if(self.unique is None and (self.solving is not None or self.counting is not None)):
+                self.hint_text = CHECKING
+                return None
+            if(self.unique):
+                for cube in self.flat_cubes:
+                    if(cube.val != 0 and cube.val != self.solution[cube.col, cube.row]):
+                        self.select(cube.row, cube.col)
+                        self.hint_text = 'The value in r{0}c{1} is wrong'.format(cube.col + 1, cube.row + 1)
+                        return None
+            else:
+                # any solution may be the one the user is heading to: only a board left without any is wrong
+                board = Board(None, self.row)
+                for cube in self.flat_cubes:
+                    board[cube.col, cube.row] = cube.val
+                if(self.board_check is None or self.board_check[0] != board.cells):
+                    self.check_board(board)
+                if(self.checking is not None):
+                    self.hint_text = CHECKING
+                    return None
+                if(self.board_check[1] == 0):
+                    self.hint_text = 'Some values are wrong: the grid has no solution left'
+                    return None
+
+        # the hints read the board row by row: cell (i, j) of the game is cell j * DIM + i of the board
+        dim = self.row
+        marks = [0] * (dim * dim)
+        for k in range(0, dim * dim):
+            i, j = divmod(k, dim)
+            marks[j * dim + i] = self.cand[k] & ~self.eliminated[k]
+        hint = find_hint(marks, dim)
+        if(hint is None):
+            self.hint_text = 'No hint: no known technique applies'
+            return None
+
+        self.hint_text = hint.text
+        if(hint.eliminations):
+            for b, mask in hint.eliminations:
+                self.eliminated[(b % dim) * dim + b // dim] |= mask
+            self.set_marks(True)
+        if(hint.place):
+            b, d = hint.place
+            self.select(b % dim, b // dim)
+            self.set_temp(d)
+        return hint
+
+    def mark_conflict(self, k):
+        """
+        This function highlights the cell if its value is repeated in its row, column or box
+        :param k: int -> flat index of the cell
+        :return: None
+        """
+        cube = self.flat_cubes[k]
+        conflict = cube.val != 0 and any(self.unit_counts[u][cube.val] > 1 for u in self.geo.cell_units[k])
+        if(conflict != cube.same_number_exists):
+            self.conflicts += 1 if conflict else -1
+            cube.same_number_exists = conflict
+
+    def de_highlight(self):
+        """
+        This function removes the cells highlight that helps the user
+        :return: None
+        """
+        for k in self.lit:
+            self.flat_cubes[k].same_number_highlight = False
+            self.flat_cubes[k].help_cells_highlight = False
+        self.lit = []
+
+    def highlight(self):
+        """
+        This function based on the currently selected value highlight cells to help the user
+        :return: None
+        """
+        self.de_highlight()
+        row, col = self.selected
+        k = row * self.col + col
+        val = self.cubes[row][col].val
+
+        # highlights the cells in the same row, column and box of the selected one
+        self.lit = [k]
+        self.lit.extend(self.geo.peers[k])
+        for p in self.lit:
+            self.flat_cubes[p].help_cells_highlight = True
+
+        # highlights other cell with the same value of the selected one
+        if(val != 0):
+            for p in self.digit_cells[val]:
+                self.flat_cubes[p].same_number_highlight = True
+            self.lit.extend(self.digit_cells[val])
+
+    def set_temp(self, k):
+        """
+        This function modifies the temporary value of modifiable cells
+        :param k: int
+        :return: None
+        """
+        if(self.selected):
+            i = self.selected[0]
+            j = self.selected[1]
+            if(not self.cubes[i][j].is_grid):
+                self.cubes[i][j].temp = k
+                self.place(i, j, 0)
+
+    def set_val(self, k):
+        """
+        This function modifies the value of modifiable cells or makes the temporary become actual
+        :param k: int
+        :return: int
+        """
+        if(self.selected):
+            i, j = self.selected
+            if(k == 0):
+                k = self.cubes[i][j].temp
+            self.place(i, j, k)
+            self.error = ''
+            self.hint_text = ''
+            self.highlight()
+        return k
+
+    def play(self, k):
+        """
+        This function confirms the value of the selected cell during the game and remembers the move to undo it
+        :param k: int
+        :return: int
+        """
+        if(not self.selected):
+            return 0
+
+        i, j = self.selected
+        if(self.cubes[i][j].val != 0):
+            k = self.cubes[i][j].val
+
+        v = self.set_val(k)
+        self.moves.append([(i, j), v])
+        return v
+
+    def undo(self):
+        """
+        This function performs the sudoku-state undo of the last move
+        :return: None
+        """
+        if(not self.moves):             # no states available. State = [(i, j), val] -> val inserted in cell (i, j)
+            return
+
+        (i, j), val = self.moves.pop()
+        self.place(i, j, 0)
+        if(not self.cubes[i][j].is_grid):
+            self.cubes[i][j].temp = 0
+
+        # highlights again based on the current user selection
+        if(self.selected):
+            self.highlight()
+
+    def select(self, ii, jj):
+        """
+        This function sets the clicked cell as selected and updates the status
+        :param ii: int
+        :param jj: int
+        :return: None
+        """
+        # clear the status
+        if(self.selected):
+            i, j = self.selected
+            self.cubes[i][j].selected = False
+
+        self.cubes[ii][jj].selected = True
+        self.selected = (ii, jj)
+        self.highlight()                    # to help the user with the highlight
+
+    def get_store(self):
+        """
+        This function returns the puzzle store of the Random button, opening it the first time
+        :return: PuzzleStore or False if there is no readable store
+        """
+        if(self.store is None):
+            from puzzle_store import PuzzleStore
+
+            try:
+                self.store = PuzzleStore(STORE)
+            except (OSError, ValueError) as e:
+                print('Puzzle store not available ({0}): puzzles are generated'.format(e))
+                self.store = False
+        return self.store
+
+    def get_puzzles(self):
+        """
+        This function returns the pool of generated puzzles, starting it the first time
+        :return: PuzzlePool
+        """
+        if(self.puzzles is None):
+            from generator import PuzzlePool
+
+            self.puzzles = PuzzlePool()
+        return self.puzzles
+
+    def random(self, tier='medium'):
+        """
+        This function loads a random sudoku game with a unique solution, read from the puzzle store or, if it
+        has no puzzle of the tier, taken from the puzzles generated in background. Only 9x9 puzzles are available
+        :param tier: string
+        :return: None
+        """
+        if(self.row != DIM):
+            raise ValueError('random puzzles are only available for 9x9 grids')
+        store = self.get_store()
+        k = store.pick(tier) if store else None
+        if(k is not None):
+            sudoku_grid, solution = store.puzzle(k), store.solution(k)
+        else:
+            sudoku_grid, solution, tier, guesses = self.get_puzzles().get(tier)
+        for i in range(0, self.row):
+            for j in range(0, self.col):
+                self.place(i, j, sudoku_grid[j, i])
+        self.fix_grid(solution)
+
+    def check_solution(self):
+        """
+        This function checks if the user solution is correct: a full grid without repeated values in any row,
+        column or box. When the grid has more than one solution any valid completion is accepted
+        :return: bool
+        """
+        correct = self.filled == self.row * self.col and self.conflicts == 0
+
+        if(correct):
+            result = 1
+            print("Sudoku solved!")
+        else:
+            result = 2
+            print('Sudoku not solved. Restart it')
+
+        # sets the bool to color the final stage
+        for cube in self.flat_cubes:
+            cube.correct = result
+        self.checked = True
+        return correct
+
+    def count_free_cubes(self):
+        """
+        This function returns how many cells have no value: if none, then the grid is full and we can check the result
+        :return: int
+        """
+        return self.row * self.col - self.filled
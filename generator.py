@@ -0,0 +1,227 @@
+"""
+    generator.py
+
+    Author: Fabio Condomitti
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from puzzle_io import CELLS, format_puzzle
+from solver import Board, PEERS, UNITS, SolveStats, count_solutions, solve
+
+TIERS = ('easy', 'medium', 'hard', 'expert')
+# clues left on the board when digging stops for each tier (hard and expert puzzles are dug until minimal)
+MIN_CLUES = {'easy': 36, 'medium': 28, 'hard': 0, 'expert': 0}
+# guesses needed by the solver to prove uniqueness above which a puzzle is expert
+EXPERT_GUESSES = 12
+
+def full_grid(rng):
+    """
+    Builds a random complete grid: the three boxes on the diagonal do not constrain each other, so they are
+    filled with random permutations and the solver completes the rest
+    :param rng: random.Random
+    :return: Board
+    """
+    board = Board()
+    for box in (18, 22, 26):
+        for k, v in zip(UNITS[box], rng.sample(range(1, 10), 9)):
+            board.cells[k] = v
+    solve(board, 9)
+    return board
+
+def has_other_solution(puzzle, k, v):
+    """
+    Checks if the puzzle still has a solution when the value v is forbidden in cell k, that is, if removing
+    the clue v from k made the solution ambiguous
+    :param puzzle: Board
+    :param k: int
+    :param v: int
+    :return: bool
+    """
+    used = set(puzzle.cells[p] for p in PEERS[k])
+    for d in range(1, 10):
+        if(d != v and d not in used):
+            trial = puzzle.copy()
+            trial.cells[k] = d
+            if(solve(trial, 9)):
+                return True
+    return False
+
+def dig(solution, min_clues, rng):
+    """
+    Removes the clues of a complete grid in random order, keeping only the removals that leave the solution
+    unique, until min_clues are left or no clue can be removed
+    :param solution: Board
+    :param min_clues: int
+    :param rng: random.Random
+    :return: Board
+    """
+    puzzle = solution.copy()
+    order = list(range(0, CELLS))
+    rng.shuffle(order)
+    clues = CELLS
+
+    for k in order:
+        if(clues <= min_clues):
+            break
+        v = puzzle.cells[k]
+        puzzle.cells[k] = 0
+        if(has_other_solution(puzzle, k, v)):
+            puzzle.cells[k] = v
+        else:
+            clues -= 1
+    return puzzle
+
+def rate(puzzle):
+    """
+    Rates a puzzle by the guesses the solver needs to find its solution and prove it unique: none and many
+    clues -> easy, none -> medium, up to EXPERT_GUESSES -> hard, more -> expert
+    :param puzzle: Board
+    :return: (string, int) -> tier and guesses
+    """
+    stats = SolveStats()
+    count_solutions(puzzle, 2, stats)
+    if(stats.guesses == 0):
+        clues = CELLS - puzzle.cells.count(0)
+        return ('easy' if clues >= MIN_CLUES['easy'] else 'medium'), 0
+    return ('hard' if stats.guesses <= EXPERT_GUESSES else 'expert'), stats.guesses
+
+def generate(tier='medium', rng=None, attempts=200):
+    """
+    Generates a puzzle with a unique solution rated in the requested tier. Raises RuntimeError when no
+    attempt hits the tier (an expert puzzle comes about once every 15 attempts)
+    :param tier: string
+    :param rng: random.Random or None
+    :param attempts: int
+    :return: (Board, Board, string, int) -> puzzle, solution, tier and guesses
+    """
+    if(tier not in TIERS):
+        raise ValueError('unknown tier: {0}'.format(tier))
+    if(rng is None):
+        rng = random.Random()
+
+    for n in range(0, attempts):
+        solution = full_grid(rng)
+        puzzle = dig(solution, MIN_CLUES[tier], rng)
+        rating, guesses = rate(puzzle)
+        if(rating == tier):
+            return puzzle, solution, rating, guesses
+    raise RuntimeError('no {0} puzzle generated in {1} attempts'.format(tier, attempts))
+
+def fill_pools(pools, wake, seed):
+    """
+    Worker process of PuzzlePool: generates puzzles for the tiers whose pool is not full, then sleeps until
+    a puzzle is taken
+    :param pools: dict of multiprocessing.Queue -> pool of each tier
+    :param wake: multiprocessing.Event
+    :param seed: int
+    :return: None
+    """
+    rng = random.Random(seed)
+    while(True):
+        wake.clear()
+        for tier, pool in pools.items():
+            while(not pool.full()):
+                try:
+                    pool.put(generate(tier, rng))
+                except RuntimeError:        # out of luck with this tier: try again
+                    pass
+        wake.wait()
+
+
+class PuzzlePool:
+    """
+    This class keeps a few puzzles of every tier ready: a background process refills the pools as soon as a
+    puzzle is taken, so asking for one does not have to wait for the generation, and the generation does
+    not compete with the game loop for the interpreter
+    """
+    def __init__(self, size=3, tiers=TIERS):
+        """
+        PuzzlePool constructor
+        :param size: int -> puzzles kept ready for each tier
+        :param tiers: tuple of strings
+        :return: None
+        """
+        ctx = multiprocessing.get_context('spawn')
+        self.pools = {tier: ctx.Queue(maxsize=size) for tier in tiers}
+        self.wake = ctx.Event()
+        self.worker = ctx.Process(target=fill_pools, args=(self.pools, self.wake, random.randrange(1 << 32)),
+                                  daemon=True)
+        self.worker.start()
+
+    def get(self, tier='medium'):
+        """
+        Returns a ready puzzle of the tier, generating it on the spot only if the pool is empty
+        :param tier: string
+        :return: (Board, Board, string, int) -> puzzle, solution, tier and guesses
+        """
+        try:
+            item = self.pools[tier].get_nowait()
+        except queue.Empty:
+            item = generate(tier)
+        self.wake.set()
+        return item
+
+    def close(self):
+        """
+        Stops the background process
+        :return: None
+        """
+        self.worker.terminate()
+        self.worker.join()
+
+
+def generate_batch(tier, count, seed):
+    """
+    Worker job of the command line: generates count puzzles of the tier
+    :param tier: string
+    :param count: int
+    :param seed: int
+    :return: list of bytes -> output lines
+    """
+    rng = random.Random(seed)
+    lines = []
+    for n in range(0, count):
+        puzzle, solution, rating, guesses = generate(tier, rng)
+        lines.append(format_puzzle(puzzle.cells)[:-1] + ' {0} {1}\n'.format(rating, guesses).encode())
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description='Sudoku puzzle generator')
+    parser.add_argument('-n', '--count', type=int, default=100, help='number of puzzles (default: 100)')
+    parser.add_argument('-t', '--tier', choices=TIERS, default='medium', help='difficulty tier (default: medium)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes (default: all the cores)')
+    parser.add_argument('-c', '--chunk-size', type=int, default=50, help='puzzles generated by a worker at a time (default: 50)')
+    parser.add_argument('-s', '--seed', type=int, help='seed of the random generator')
+    parser.add_argument('-o', '--output', help='output file (default: standard output)')
+    args = parser.parse_args()
+
+    if(args.count < 1 or args.workers < 1 or args.chunk_size < 1):
+        parser.error('count, workers and chunk size must be positive')
+
+    seed = args.seed if args.seed is not None else random.randrange(1 << 32)
+    sizes = [min(args.chunk_size, args.count - k) for k in range(0, args.count, args.chunk_size)]
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    start = time.perf_counter()
+
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            jobs = [pool.submit(generate_batch, args.tier, size, seed + n) for n, size in enumerate(sizes)]
+            for job in jobs:
+                out.writelines(job.result())
+    finally:
+        if(args.output):
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print('Generated {0} {1} puzzles in {2:.1f} s: {3:.0f} puzzles/hour'.format(
+        args.count, args.tier, elapsed, args.count / elapsed * 3600 if elapsed else 0), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
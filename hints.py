@@ -0,0 +1,208 @@
+"""
+    hints.py
+
+    Author: Fabio Condomitti
+"""
+from solver import geometry
+
+# techniques tried by find_hint(), from the easiest to the hardest
+TECHNIQUES = ('naked single', 'hidden single', 'naked pair', 'hidden pair', 'pointing', 'x-wing')
+
+
+def digits_of(mask):
+    """
+    Returns the digits of a candidate mask (bit k set -> digit k + 1)
+    :param mask: int
+    :return: list of int
+    """
+    digits = []
+    while(mask):
+        bit = mask & -mask
+        digits.append(bit.bit_length())
+        mask ^= bit
+    return digits
+
+def cell_name(k, DIM):
+    """
+    Returns the name of a cell: r3c7 is the cell in the third row and seventh column
+    :param k: int -> row * DIM + col
+    :param DIM: int
+    :return: string
+    """
+    return 'r{0}c{1}'.format(k // DIM + 1, k % DIM + 1)
+
+def unit_name(u, DIM):
+    """
+    Returns the name of a unit of the geometry tables
+    :param u: int
+    :param DIM: int
+    :return: string
+    """
+    kind = ('row', 'column', 'box')[u // DIM]
+    return '{0} {1}'.format(kind, u % DIM + 1)
+
+
+class Hint:
+    """
+    This class describes a logical step: the digit to place in a cell, or the candidates to remove from some
+    cells, the technique that proves it and the cells the reasoning is about
+    """
+    def __init__(self, technique, cells, digits, text, place=None, eliminations=()):
+        """
+        Hint constructor
+        :param technique: string -> one of TECHNIQUES
+        :param cells: tuple of int -> cells the reasoning is about
+        :param digits: int -> mask of the digits the reasoning is about
+        :param text: string -> the step explained to the user
+        :param place: (int, int) or None -> cell and digit to place
+        :param eliminations: list of (int, int) -> cell and mask of the candidates removed from it
+        :return: None
+        """
+        self.technique = technique
+        self.cells = cells
+        self.digits = digits
+        self.text = text
+        self.place = place
+        self.eliminations = eliminations
+
+    def __str__(self):
+        return self.text
+
+def eliminate(marks, cells, mask, keep=()):
+    """
+    Returns the candidates of mask that can be removed from the cells, except the ones in keep
+    :param marks: list of int
+    :param cells: iterable of int
+    :param mask: int
+    :param keep: tuple of int
+    :return: list of (int, int)
+    """
+    return [(k, marks[k] & mask) for k in cells if marks[k] & mask and k not in keep]
+
+def naked_single(marks, geo):
+    """
+    A free cell with a single candidate
+    """
+    for k in range(0, len(marks)):
+        c = marks[k]
+        if(c and c & (c - 1) == 0):
+            d = c.bit_length()
+            return Hint('naked single', (k,), c, 'Naked single: {0} can only be {1}'.format(
+                cell_name(k, geo.dim), d), place=(k, d))
+
+def hidden_single(marks, geo):
+    """
+    A digit with a single possible cell in a unit
+    """
+    for u, unit in enumerate(geo.units):
+        once = 0
+        twice = 0
+        for k in unit:
+            c = marks[k]
+            twice |= once & c
+            once |= c
+        hidden = once & ~twice
+        if(hidden):
+            bit = hidden & -hidden
+            for k in unit:
+                if(marks[k] & bit):
+                    d = bit.bit_length()
+                    return Hint('hidden single', (k,), bit, 'Hidden single: {0} fits only {1} in {2}'.format(
+                        d, cell_name(k, geo.dim), unit_name(u, geo.dim)), place=(k, d))
+
+def naked_pair(marks, geo):
+    """
+    Two cells of a unit with the same two candidates: no other cell of the unit can hold them
+    """
+    for u, unit in enumerate(geo.units):
+        pairs = {}
+        for k in unit:
+            c = marks[k]
+            if(c and bin(c).count('1') == 2):
+                if(c in pairs):
+                    pair = (pairs[c], k)
+                    removed = eliminate(marks, unit, c, pair)
+                    if(removed):
+                        return Hint('naked pair', pair, c, 'Naked pair: {0} and {1} take {2} and {3} in {4}'.format(
+                            cell_name(pair[0], geo.dim), cell_name(pair[1], geo.dim), *digits_of(c), unit_name(u, geo.dim)),
+                            eliminations=removed)
+                else:
+                    pairs[c] = k
+
+def hidden_pair(marks, geo):
+    """
+    Two digits that fit only in the same two cells of a unit: those cells cannot hold anything else
+    """
+    for u, unit in enumerate(geo.units):
+        places = {}
+        for d in range(0, geo.dim):
+            bit = 1 << d
+            cells = tuple(k for k in unit if marks[k] & bit)
+            if(len(cells) == 2):
+                if(cells in places):
+                    c = places[cells] | bit
+                    removed = eliminate(marks, cells, ~c)
+                    if(removed):
+                        return Hint('hidden pair', cells, c, 'Hidden pair: {0} and {1} fit only {2} and {3} in {4}'.format(
+                            *digits_of(c), cell_name(cells[0], geo.dim), cell_name(cells[1], geo.dim), unit_name(u, geo.dim)),
+                            eliminations=removed)
+                else:
+                    places[cells] = bit
+
+def pointing(marks, geo):
+    """
+    A digit that fits in a box only where the box crosses a row or a column: it goes nowhere else in that line
+    """
+    for part, rest_box, rest_line in geo.segments:
+        digits = 0
+        for k in part:
+            digits |= marks[k]
+        for k in rest_box:
+            digits &= ~marks[k]
+        while(digits):
+            bit = digits & -digits
+            digits ^= bit
+            removed = eliminate(marks, rest_line, bit)
+            if(removed):
+                cells = tuple(k for k in part if marks[k] & bit)
+                line = geo.cell_units[part[0]][0 if geo.row_of[part[0]] == geo.row_of[part[-1]] else 1]
+                return Hint('pointing', cells, bit, 'Pointing: {0} of box {1} lies in {2}'.format(
+                    bit.bit_length(), geo.box_of[part[0]] + 1, unit_name(line, geo.dim)), eliminations=removed)
+
+def x_wing(marks, geo):
+    """
+    A digit that fits in exactly the same two columns in two rows (or the same two rows in two columns): one
+    of the two diagonals holds it, so it goes nowhere else in those columns (rows)
+    """
+    DIM = geo.dim
+    for lines, crossing in ((0, 1), (1, 0)):
+        for d in range(0, DIM):
+            bit = 1 << d
+            seen = {}
+            for n in range(0, DIM):
+                unit = geo.units[lines * DIM + n]
+                where = tuple(i for i, k in enumerate(unit) if marks[k] & bit)
+                if(len(where) != 2):
+                    continue
+                if(where in seen):
+                    m = seen[where]
+                    corners = tuple(geo.units[lines * DIM + line][i] for line in (m, n) for i in where)
+                    targets = [k for i in where for k in geo.units[crossing * DIM + i]]
+                    removed = eliminate(marks, targets, bit, corners)
+                    if(removed):
+                        return Hint('x-wing', corners, bit, 'X-Wing: {0} of {1} and {2} lies in {3} and {4}'.format(
+                            d + 1, unit_name(lines * DIM + m, DIM), unit_name(lines * DIM + n, DIM),
+                            unit_name(crossing * DIM + where[0], DIM), unit_name(crossing * DIM + where[1], DIM)), eliminations=removed)
+                else:
+                    seen[where] = n
+
+FINDERS = (naked_single, hidden_single, naked_pair, hidden_pair, pointing, x_wing)
+
+def find_hint(marks, DIM=9):
+    """
+    Finds the next logical step from the pencil marks of a board, trying the easiest techniques first
+    :param marks: list of int -> candidate mask of every cell, row by row, 0 for the cells with a value
+    :param DIM: int
+    :return: Hint or None if none of the techniques applies
+    """
+    return next((hint for hint in (f(marks, geometry(DIM)) for f in FINDERS) if hint is not None), None)
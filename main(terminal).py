@@ -3,9 +3,26 @@
 
     Author: Fabio Condomitti
 """
-from solver import print_grid, solve
+import argparse
+import os
+import sys
+import time
 
-def main():
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import shared_memory
+from puzzle_io import CELLS, FORMATS, READ_SIZE, format_puzzle, iter_puzzles
+from solver import CANCELLED, NODE_LIMIT, SOLVED, TIMEOUT, UNSOLVABLE, print_grid, solve, SolveStats
+
+STOPPED = (TIMEOUT, NODE_LIMIT, CANCELLED)     # statuses of the puzzles given up because of the limits
+
+def demo(verbose=False):
+    """
+    Solves and prints the example grid
+    :param verbose: bool -> prints every counter and timer of the solver
+    :return: None
+    """
     sudoku_grid = [ [0,8,0,  0,0,0,  2,0,0],
                     [0,0,0,  0,8,4,  0,9,0],
                     [0,0,6,  3,2,0,  0,1,0],
@@ -32,8 +49,235 @@ def main():
     print_grid(sudoku_grid)
     print('....................................')
     copy = sudoku_grid
-    solve(copy, 9)
+    stats = SolveStats()
+    solve(copy, 9, stats=stats)
     print_grid(copy)
+    print('Guesses needed: {0}'.format(stats.guesses))
+    if(verbose):
+        print('Solver stats: {0}'.format(stats))
+
+def solve_cells(cells, stats=None, limits=None):
+    """
+    Solves a puzzle given as 81 cell values
+    :param cells: bytes
+    :param stats: SolveStats or None
+    :param limits: (float or None, int or None) or None -> timeout in s and max nodes of each puzzle
+    :return: (bytes, int) -> the solution, or the puzzle itself if it is not solved, and the solver status
+    """
+    timeout, max_nodes = limits or (None, None)
+    gr = [list(cells[i:i + 9]) for i in range(0, CELLS, 9)]
+    result = solve(gr, 9, stats=stats, timeout=timeout, max_nodes=max_nodes)
+    if(result is None):
+        return bytes(cells), UNSOLVABLE
+    if(result):
+        return bytes(v for row in gr for v in row), SOLVED
+    return bytes(cells), result.status
+
+def solve_batch(puzzles, verbose=False, limits=None):
+    """
+    Worker job of the streaming mode: solves a short list of puzzles
+    :param puzzles: list of bytes
+    :param verbose: bool -> collects the solver stats of the batch
+    :param limits: (float or None, int or None) or None -> timeout in s and max nodes of each puzzle
+    :return: (list of (bytes, int), SolveStats or None)
+    """
+    stats = SolveStats() if verbose else None
+    return [solve_cells(cells, stats, limits) for cells in puzzles], stats
+
+def solve_chunk(shm_name, start, stop, verbose=False, limits=None):
+    """
+    Worker job: solves the puzzles start..stop-1 stored in the shared memory block and overwrites each of
+    them with its solution. Unsolvable or invalid puzzles and the ones stopped by the limits are left untouched
+    :param shm_name: string
+    :param start: int
+    :param stop: int
+    :param verbose: bool -> collects the solver stats of the chunk
+    :param limits: (float or None, int or None) or None -> timeout in s and max nodes of each puzzle
+    :return: (int, int, SolveStats or None) -> number of solved puzzles, of stopped puzzles and stats
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    stats = SolveStats() if verbose else None
+    solved = 0
+    stopped = 0
+    try:
+        for k in range(start, stop):
+            offset = k * CELLS
+            solution, status = solve_cells(shm.buf[offset:offset + CELLS].tobytes(), stats, limits)
+            if(status == SOLVED):
+                shm.buf[offset:offset + CELLS] = solution
+                solved += 1
+            elif(status in STOPPED):
+                stopped += 1
+    finally:
+        shm.close()
+    return solved, stopped, stats
+
+def print_stopped(stopped, limits):
+    """
+    Prints on the standard error how many puzzles were given up because of the limits
+    :param stopped: int
+    :param limits: (float or None, int or None) or None
+    :return: None
+    """
+    if(limits is not None):
+        print('Stopped by the limits: {0} puzzles'.format(stopped), file=sys.stderr)
+
+def print_stats(stats):
+    """
+    Prints the solver stats summed over all the puzzles on the standard error
+    :param stats: SolveStats or None
+    :return: None
+    """
+    if(stats is not None):
+        print('Solver stats: {0}'.format(stats), file=sys.stderr)
+
+def solve_file(path, fmt, workers, chunk_size, output=None, verbose=False, limits=None):
+    """
+    Solves every puzzle of the file over a pool of worker processes. Puzzles and solutions live in one
+    shared memory block, so the workers only receive the bounds of their chunk and return a counter
+    :param path: string
+    :param fmt: string or None
+    :param workers: int
+    :param chunk_size: int
+    :param output: string or None -> file where the solutions are written, one per line
+    :param verbose: bool -> prints the solver stats
+    :param limits: (float or None, int or None) or None -> timeout in s and max nodes of each puzzle
+    :return: None
+    """
+    data = bytearray()
+    for cells in iter_puzzles(path, fmt):
+        data += cells
+    total = len(data) // CELLS
+    if(total == 0):
+        print('No puzzles found in {0}'.format(path))
+        return
+
+    start = time.perf_counter()
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    try:
+        shm.buf[:len(data)] = data
+        bounds = [(k, min(k + chunk_size, total)) for k in range(0, total, chunk_size)]
+
+        if(workers == 1):
+            results = [solve_chunk(shm.name, a, b, verbose, limits) for a, b in bounds]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                jobs = [pool.submit(solve_chunk, shm.name, a, b, verbose, limits) for a, b in bounds]
+                results = [job.result() for job in jobs]
+        solved = sum(n for n, s, chunk_stats in results)
+        elapsed = time.perf_counter() - start
+
+        if(output):
+            with open(output, 'wb') as f:
+                for k in range(0, len(data), CELLS):
+                    f.write(format_puzzle(shm.buf[k:k + CELLS]))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    print('Solved {0}/{1} puzzles in {2:.3f} s with {3} workers: {4:.1f} puzzles/sec'.format(
+        solved, total, elapsed, workers, total / elapsed))
+    print_stopped(sum(s for n, s, chunk_stats in results), limits)
+    if(verbose):
+        stats = SolveStats()
+        for n, s, chunk_stats in results:
+            stats.add(chunk_stats)
+        print_stats(stats)
+
+def solve_stream(path, fmt, workers, chunk_size, output=None, verbose=False, limits=None):
+    """
+    Reads, solves and writes the puzzles one by one, so memory does not grow with the size of the input.
+    With more than one worker at most two chunks per worker are in flight and the solutions are written
+    in input order; the chunks start with a single puzzle and double up to chunk_size, so the first results
+    come out within milliseconds
+    :param path: string
+    :param fmt: string or None
+    :param workers: int
+    :param chunk_size: int
+    :param output: string or None -> file where the solutions are written (standard output if None)
+    :param verbose: bool -> prints the solver stats
+    :param limits: (float or None, int or None) or None -> timeout in s and max nodes of each puzzle
+    :return: None
+    """
+    stats = SolveStats() if verbose else None
+    out = open(output, 'wb', buffering=READ_SIZE) if output else sys.stdout.buffer
+    puzzles = iter_puzzles(path, fmt)
+    total = 0
+    solved = 0
+    stopped = 0
+    start = time.perf_counter()
+
+    def write(results):
+        nonlocal total, solved, stopped
+        for solution, status in results:
+            out.write(format_puzzle(solution))
+            solved += status == SOLVED
+            stopped += status in STOPPED
+            total += 1
+            if(total == 1):
+                out.flush()                 # shows the first result right away
+
+    try:
+        if(workers == 1):
+            for cells in puzzles:
+                write([solve_cells(cells, stats, limits)])
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = deque()
+                size = 1
+                while(True):
+                    batch = list(islice(puzzles, size))
+                    size = min(2 * size, chunk_size)
+                    if(batch):
+                        pending.append(pool.submit(solve_batch, batch, verbose, limits))
+                    if(pending and (not batch or len(pending) >= 2 * workers)):
+                        results, batch_stats = pending.popleft().result()
+                        write(results)
+                        if(verbose):
+                            stats.add(batch_stats)
+                    elif(not batch):
+                        break
+        out.flush()
+    finally:
+        if(output):
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print('Solved {0}/{1} puzzles in {2:.3f} s with {3} workers: {4:.1f} puzzles/sec'.format(
+        solved, total, elapsed, workers, total / elapsed if elapsed else 0), file=sys.stderr)
+    print_stopped(stopped, limits)
+    print_stats(stats)
+
+def main():
+    parser = argparse.ArgumentParser(description='Terminal sudoku solver')
+    parser.add_argument('puzzles', nargs='?', help='puzzle file (one 81 characters puzzle per line, .sdk or grids.json layout); without it the example grid is solved')
+    parser.add_argument('-f', '--format', choices=FORMATS, help='format of the puzzle file (default: guessed from the extension)')
+    parser.add_argument('-s', '--stream', action='store_true', help='read, solve and write the puzzles one at a time with constant memory (solutions go to the standard output without -o)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes (default: all the cores)')
+    parser.add_argument('-c', '--chunk-size', type=int, default=256, help='puzzles handed to a worker at a time (default: 256)')
+    parser.add_argument('-o', '--output', help='file where the solutions are written, one per line')
+    parser.add_argument('-t', '--timeout', type=float, help='give up a puzzle after this many seconds and leave it unsolved')
+    parser.add_argument('-n', '--max-nodes', type=int, help='give up a puzzle after this many guesses and leave it unsolved')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print the solver counters and phase timers')
+    args = parser.parse_args()
+
+    if(args.workers < 1 or args.chunk_size < 1):
+        parser.error('workers and chunk size must be positive')
+    if((args.timeout is not None and args.timeout <= 0) or (args.max_nodes is not None and args.max_nodes < 0)):
+        parser.error('timeout must be positive and max nodes not negative')
+    limits = (args.timeout, args.max_nodes) if args.timeout is not None or args.max_nodes is not None else None
+
+    if(args.puzzles is None):
+        demo(args.verbose)
+        return
+
+    try:
+        if(args.stream):
+            solve_stream(args.puzzles, args.format, args.workers, args.chunk_size, args.output, args.verbose, limits)
+        else:
+            solve_file(args.puzzles, args.format, args.workers, args.chunk_size, args.output, args.verbose, limits)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
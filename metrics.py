@@ -0,0 +1,17 @@
+"""
+    metrics.py
+
+    Author: Fabio Condomitti
+"""
+
+def percentile(values, p):
+    """
+    Returns the p-th percentile of the sorted values (nearest rank)
+    :param values: sorted list of float
+    :param p: float -> between 0 and 100
+    :return: float
+    """
+    if(not values):
+        return 0.0
+    rank = max(1, -(-len(values) * p // 100))
+    return values[int(rank) - 1]
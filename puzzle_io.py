@@ -0,0 +1,173 @@
+"""
+    puzzle_io.py
+
+    Author: Fabio Condomitti
+"""
+
+CELLS = 81
+READ_SIZE = 1 << 16
+FORMATS = ('lines', 'sdk', 'json', 'store')
+# maps the characters of a puzzle to the cell values: '.' and '0' are empty cells, anything else is invalid
+CHAR_TO_VAL = bytes(0 if c == ord('.') else c - ord('0') if ord('0') <= c <= ord('9') else 255 for c in range(256))
+VAL_TO_CHAR = bytes(ord('0') + v if v < 10 else ord('?') for v in range(256))
+
+def detect_format(path):
+    """
+    Guesses the format of a puzzle file from its extension: 'json' (grids.json layout), 'sdk', 'store'
+    (packed puzzle store, see puzzle_store.py) or 'lines'
+    :param path: string
+    :return: string
+    """
+    if(path.lower().endswith('.json')):
+        return 'json'
+    if(path.lower().endswith('.sdk')):
+        return 'sdk'
+    if(path.lower().endswith('.sdb')):
+        return 'store'
+    return 'lines'
+
+def iter_lines(f, path, fields=False):
+    """
+    Yields the puzzles of a file with one puzzle per line, 81 characters each, optionally followed by other
+    fields separated by white spaces (e.g. a rating). Blank lines and lines starting with '#' are skipped
+    :param f: binary file
+    :param path: string
+    :param fields: bool -> yields the other fields of the line too
+    :return: generator of bytes -> 81 cell values per puzzle, or of (bytes, list of bytes) with fields
+    """
+    for n, line in enumerate(f, 1):
+        line = line.strip()
+        if(not line or line.startswith(b'#')):
+            continue
+        parts = line.split() if fields else line.split(None, 1)
+        cells = parts[0].translate(CHAR_TO_VAL)
+        if(len(cells) != CELLS or max(cells) > 9):
+            raise ValueError('{0}:{1}: not a valid 81 characters puzzle'.format(path, n))
+        yield (cells, parts[1:]) if fields else cells
+
+def iter_sdk(f, path):
+    """
+    Yields the puzzles of a SadMan .sdk file: 9 rows of 9 characters per puzzle, '#' comment lines.
+    Several puzzles can follow each other in the same file
+    :param f: binary file
+    :param path: string
+    :return: generator of bytes -> 81 cell values per puzzle
+    """
+    rows = []
+    for n, line in enumerate(f, 1):
+        line = line.strip()
+        if(not line or line.startswith(b'#')):
+            continue
+        row = line.translate(CHAR_TO_VAL)
+        if(len(row) != 9 or max(row) > 9):
+            raise ValueError('{0}:{1}: not a valid 9 characters row'.format(path, n))
+        rows.append(row)
+        if(len(rows) == 9):
+            yield b''.join(rows)
+            rows = []
+    if(rows):
+        raise ValueError('{0}: incomplete puzzle at the end of the file'.format(path))
+
+def iter_json(f, path):
+    """
+    Yields the puzzles of a file with the grids.json layout ({"name": 9x9 list, ...}) decoding one entry at a
+    time, so only the entry being read is kept in memory
+    :param f: text file
+    :param path: string
+    :return: generator of bytes -> 81 cell values per puzzle
+    """
+    import json
+
+    decoder = json.JSONDecoder()
+    text = ''
+    pos = 0
+    eof = False
+
+    def read_more():
+        nonlocal text, pos, eof
+        chunk = f.read(READ_SIZE)
+        eof = not chunk
+        text = text[pos:] + chunk
+        pos = 0
+
+    def next_char():
+        # skips the white spaces and returns the next character ('' at the end of the file)
+        nonlocal pos
+        while(True):
+            while(pos < len(text) and text[pos].isspace()):
+                pos += 1
+            if(pos < len(text) or eof):
+                return text[pos:pos + 1]
+            read_more()
+
+    def decode():
+        # decodes the JSON value starting at pos, reading until it is complete
+        nonlocal pos
+        next_char()
+        while(True):
+            try:
+                value, pos = decoder.raw_decode(text, pos)
+                return value
+            except json.JSONDecodeError:
+                if(eof):
+                    raise ValueError('{0}: malformed JSON'.format(path))
+                read_more()
+
+    if(next_char() != '{'):
+        raise ValueError('{0}: expected a JSON object'.format(path))
+    pos += 1
+
+    while(True):
+        c = next_char()
+        if(c == '}'):
+            return
+        if(c == ','):
+            pos += 1
+            continue
+        name = decode()
+        if(next_char() != ':'):
+            raise ValueError('{0}: malformed JSON'.format(path))
+        pos += 1
+        gr = decode()
+        if(not isinstance(gr, list) or len(gr) != 9 or any(not isinstance(row, list) or len(row) != 9 for row in gr)):
+            raise ValueError('{0}: grid {1} is not 9x9'.format(path, name))
+        try:
+            yield bytes(v for row in gr for v in row)
+        except (TypeError, ValueError):
+            raise ValueError('{0}: grid {1} has invalid values'.format(path, name))
+
+def iter_puzzles(path, fmt=None):
+    """
+    Lazily yields the puzzles of a file in the given format ('lines', 'sdk', 'json' or 'store', guessed from
+    the extension when None)
+    :param path: string
+    :param fmt: string
+    :return: generator of bytes -> 81 cell values per puzzle
+    """
+    if(fmt is None):
+        fmt = detect_format(path)
+
+    if(fmt == 'store'):
+        from puzzle_store import PuzzleStore
+
+        with PuzzleStore(path) as store:
+            for k in range(0, len(store)):
+                yield bytes(store.puzzle(k).cells)
+    elif(fmt == 'json'):
+        with open(path, 'r') as f:
+            for cells in iter_json(f, path):
+                if(max(cells) > 9):
+                    raise ValueError('{0}: cell values must be between 0 and 9'.format(path))
+                yield cells
+    else:
+        reader = iter_sdk if fmt == 'sdk' else iter_lines
+        with open(path, 'rb', buffering=READ_SIZE) as f:
+            yield from reader(f, path)
+
+def format_puzzle(cells):
+    """
+    Converts 81 cell values into an 81 characters line
+    :param cells: bytes
+    :return: bytes
+    """
+    return bytes(cells).translate(VAL_TO_CHAR) + b'\n'
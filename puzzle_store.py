@@ -0,0 +1,353 @@
+"""
+    puzzle_store.py
+
+    Author: Fabio Condomitti
+"""
+import argparse
+import mmap
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from operator import or_
+from generator import TIERS, rate
+from puzzle_io import CELLS, FORMATS, READ_SIZE, detect_format, iter_lines, iter_puzzles
+from solver import Board, count_solutions, solve
+
+# A store is a fixed-width header followed by fixed-size records, grouped by difficulty:
+#   header -> magic, version, flags, DIM, count and the index of the first record of each difficulty group
+#   record -> 81 cells packed at 4 bits each (41 bytes), the packed solution (41 bytes, only when the flags
+#             say so, all zeros if the puzzle has none) and the difficulty byte
+# so record k starts at HEADER.size + k * record size and is read straight from the memory mapped file
+MAGIC = b'SDKP'
+VERSION = 1
+HAS_SOLUTIONS = 1
+HEADER = struct.Struct('<4sBBBxQ5Q8x')       # 64 bytes
+PACKED = (CELLS + 1) // 2
+UNRATED = 255                                 # difficulty byte of the puzzles without a tier (index in TIERS otherwise)
+GROUPS = TIERS + (None,)                      # order of the records in the file
+
+SHIFT = bytes((b << 4) & 0xff for b in range(256))
+HIGH = bytes(b >> 4 for b in range(256))
+LOW = bytes(b & 0xf for b in range(256))
+
+
+def pack_cells(cells):
+    """
+    Packs 81 cell values in 41 bytes, two cells per byte (the first one in the high half)
+    :param cells: bytes
+    :return: bytes
+    """
+    cells = bytes(cells) + b'\0'
+    return bytes(map(or_, cells[0::2].translate(SHIFT), cells[1::2]))
+
+def unpack_cells(packed):
+    """
+    Unpacks 41 bytes into 81 cell values
+    :param packed: bytes or memoryview
+    :return: bytearray
+    """
+    packed = bytes(packed)
+    cells = bytearray(2 * PACKED)
+    cells[0::2] = packed.translate(HIGH)
+    cells[1::2] = packed.translate(LOW)
+    del cells[CELLS:]
+    return cells
+
+def difficulty_of(tier):
+    """
+    Returns the difficulty byte of a tier
+    :param tier: string or None
+    :return: int
+    """
+    return TIERS.index(tier) if tier in TIERS else UNRATED
+
+
+class PuzzleStore:
+    """
+    This class reads a puzzle store through a memory map: opening it reads only the header, and any puzzle is
+    reached in O(1) without copying the file, whatever the number of puzzles it holds
+    """
+    def __init__(self, path):
+        """
+        PuzzleStore constructor
+        :param path: string
+        :return: None
+        """
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if(size < HEADER.size):
+                raise ValueError('{0}: not a puzzle store'.format(path))
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.file.close()
+            raise
+        magic, version, self.flags, self.dim, self.count, *starts = HEADER.unpack_from(self.map)
+        self.record = PACKED + (PACKED if self.flags & HAS_SOLUTIONS else 0) + 1
+        if(magic != MAGIC or version != VERSION or self.dim != 9 or size != HEADER.size + self.count * self.record):
+            self.close()
+            raise ValueError('{0}: not a puzzle store of version {1}'.format(path, VERSION))
+        self.starts = starts + [self.count]
+        self.view = memoryview(self.map)
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def offset(self, k):
+        """
+        Returns where record k starts in the file
+        :param k: int
+        :return: int
+        """
+        if(k < 0):
+            k += self.count
+        if(k < 0 or k >= self.count):
+            raise IndexError('puzzle {0} out of range'.format(k))
+        return HEADER.size + k * self.record
+
+    def raw(self, k):
+        """
+        Returns record k as it is in the file, without copying it
+        :param k: int
+        :return: memoryview
+        """
+        start = self.offset(k)
+        return self.view[start:start + self.record]
+
+    def puzzle(self, k):
+        """
+        Returns puzzle k
+        :param k: int
+        :return: Board
+        """
+        start = self.offset(k)
+        return Board(unpack_cells(self.view[start:start + PACKED]))
+
+    def solution(self, k):
+        """
+        Returns the solution of puzzle k, None if the store has no solutions or the puzzle has none
+        :param k: int
+        :return: Board or None
+        """
+        start = self.offset(k) + PACKED
+        if(not self.flags & HAS_SOLUTIONS or not any(self.view[start:start + PACKED])):
+            return None
+        return Board(unpack_cells(self.view[start:start + PACKED]))
+
+    def tier(self, k):
+        """
+        Returns the tier of puzzle k
+        :param k: int
+        :return: string or None if the puzzle is not rated
+        """
+        d = self.view[self.offset(k) + self.record - 1]
+        return TIERS[d] if d < len(TIERS) else None
+
+    def __getitem__(self, k):
+        return self.puzzle(k), self.solution(k), self.tier(k)
+
+    def tier_range(self, tier):
+        """
+        Returns the indexes of the puzzles of a tier (None for the unrated ones), contiguous in the store
+        :param tier: string or None
+        :return: range
+        """
+        g = GROUPS.index(tier)
+        return range(self.starts[g], self.starts[g + 1])
+
+    def pick(self, tier=None, rng=random):
+        """
+        Returns the index of a random puzzle of the tier, or of the whole store when tier is None
+        :param tier: string or None
+        :param rng: random.Random
+        :return: int or None if there is no such puzzle
+        """
+        indexes = self.tier_range(tier) if tier is not None else range(0, self.count)
+        return rng.choice(indexes) if indexes else None
+
+    def close(self):
+        """
+        Releases the memory map and the file
+        :return: None
+        """
+        if(getattr(self, 'view', None) is not None):
+            self.view.release()
+            self.view = None
+        if(getattr(self, 'map', None) is not None):
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+def write_store(path, entries, solutions=False):
+    """
+    Writes a puzzle store. The records are spooled to a temporary file per difficulty group and then copied
+    after the header, so memory does not grow with the number of puzzles; the file is replaced only once
+    it is complete
+    :param path: string
+    :param entries: iterable of (bytes, bytes or None, string or None) -> cells, solution and tier
+    :param solutions: bool -> store the solutions
+    :return: list of int -> number of puzzles of each tier, the unrated ones last
+    """
+    groups = [tempfile.TemporaryFile() for g in GROUPS]
+    counts = [0] * len(GROUPS)
+    empty = bytes(PACKED)
+    tmp = path + '.tmp'
+    try:
+        for cells, solution, tier in entries:
+            record = pack_cells(cells)
+            if(solutions):
+                record += pack_cells(solution) if solution is not None else empty
+            g = GROUPS.index(tier) if tier in TIERS else len(TIERS)
+            groups[g].write(record + bytes((difficulty_of(tier),)))
+            counts[g] += 1
+
+        starts = [sum(counts[:g]) for g in range(0, len(GROUPS))]
+        with open(tmp, 'wb') as out:
+            out.write(HEADER.pack(MAGIC, VERSION, HAS_SOLUTIONS if solutions else 0, 9, sum(counts), *starts))
+            for f in groups:
+                f.seek(0)
+                shutil.copyfileobj(f, out, READ_SIZE)
+        os.replace(tmp, path)
+    finally:
+        for f in groups:
+            f.close()
+        if(os.path.exists(tmp)):            # the copy failed: the old store, if any, is left as it was
+            os.remove(tmp)
+    return counts
+
+def read_entries(path, fmt=None):
+    """
+    Yields the puzzles of a file with the tier and the solution it already has: the tier written by
+    generator.py after a puzzle line, and both of them from a store
+    :param path: string
+    :param fmt: string or None
+    :return: generator of (bytes, bytes or None, string or None)
+    """
+    if(fmt is None):
+        fmt = detect_format(path)
+    if(fmt == 'store'):
+        with PuzzleStore(path) as store:
+            for k in range(0, len(store)):
+                solution = store.solution(k)
+                yield bytes(store.puzzle(k).cells), bytes(solution.cells) if solution is not None else None, store.tier(k)
+    elif(fmt == 'lines'):
+        with open(path, 'rb', buffering=READ_SIZE) as f:
+            for cells, fields in iter_lines(f, path, fields=True):
+                tier = fields[0].decode('ascii', 'replace') if fields else None
+                yield cells, None, tier if tier in TIERS else None
+    else:
+        for cells in iter_puzzles(path, fmt):
+            yield cells, None, None
+
+def complete_entries(entries, solutions=False, rerate=False):
+    """
+    Worker job of the converter: solves and rates the puzzles that need it. Only the puzzles with a single
+    solution are rated, the others are stored unrated: the game takes the solution of a rated puzzle as the
+    only one
+    :param entries: list of (bytes, bytes or None, string or None)
+    :param solutions: bool -> solve the puzzles without a solution
+    :param rerate: bool -> rate every puzzle again
+    :return: list of (bytes, bytes or None, string or None)
+    """
+    done = []
+    for cells, solution, tier in entries:
+        if(solutions and solution is None):
+            board = Board(bytearray(cells))
+            if(solve(board, 9)):
+                solution = bytes(board.cells)
+        if(rerate or (tier is None and solutions)):
+            board = Board(bytearray(cells))
+            tier = rate(board)[0] if count_solutions(board, 2) == 1 else None
+        done.append((cells, solution, tier))
+    return done
+
+def convert(inputs, fmt, output, solutions=False, rerate=False, workers=1, chunk_size=256):
+    """
+    Converts puzzle files into a store. Solving and rating run over worker processes, with at most two
+    chunks per worker in flight
+    :param inputs: list of string
+    :param fmt: string or None
+    :param output: string
+    :param solutions: bool -> store the solutions, solving the puzzles that do not have one (and rating the
+                      unrated ones, since the solver runs anyway)
+    :param rerate: bool -> rate every puzzle again
+    :param workers: int
+    :param chunk_size: int
+    :return: list of int -> number of puzzles of each tier, the unrated ones last
+    """
+    def entries():
+        for path in inputs:
+            yield from read_entries(path, fmt)
+
+    def completed():
+        source = entries()
+        if(not solutions and not rerate):
+            yield from source
+        elif(workers == 1):
+            while(True):
+                chunk = list(islice(source, chunk_size))
+                if(not chunk):
+                    return
+                yield from complete_entries(chunk, solutions, rerate)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = deque()
+                while(True):
+                    chunk = list(islice(source, chunk_size))
+                    if(chunk):
+                        pending.append(pool.submit(complete_entries, chunk, solutions, rerate))
+                    if(pending and (not chunk or len(pending) >= 2 * workers)):
+                        yield from pending.popleft().result()
+                    elif(not chunk):
+                        return
+
+    return write_store(output, completed(), solutions)
+
+def main():
+    parser = argparse.ArgumentParser(description='Packed puzzle store: conversion from puzzle files and summary')
+    parser.add_argument('inputs', nargs='+', help='puzzle files (one puzzle per line, optionally followed by the tier written by '
+                        'generator.py, .sdk, grids.json layout or another store), or the store to describe with -i')
+    parser.add_argument('-o', '--output', help='store to write (.sdb)')
+    parser.add_argument('-f', '--format', choices=FORMATS, help='format of the input files (default: guessed from the extension)')
+    parser.add_argument('-s', '--solutions', action='store_true', help='store the solutions, solving the puzzles and rating the unrated ones')
+    parser.add_argument('-r', '--rate', action='store_true', help='rate every puzzle again with the solver')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes (default: all the cores)')
+    parser.add_argument('-c', '--chunk-size', type=int, default=256, help='puzzles handed to a worker at a time (default: 256)')
+    parser.add_argument('-i', '--info', action='store_true', help='print the number of puzzles of each tier of the stores')
+    args = parser.parse_args()
+
+    if(args.workers < 1 or args.chunk_size < 1):
+        parser.error('workers and chunk size must be positive')
+    try:
+        if(args.info):
+            for path in args.inputs:
+                with PuzzleStore(path) as store:
+                    print('{0}: {1} puzzles{2} ({3})'.format(path, len(store), ' with solutions' if store.flags & HAS_SOLUTIONS else '',
+                          ', '.join('{0} {1}'.format(tier or 'unrated', len(store.tier_range(tier))) for tier in GROUPS)))
+            return
+        if(not args.output):
+            parser.error('the output store is required (-o)')
+        start = time.perf_counter()
+        counts = convert(args.inputs, args.format, args.output, args.solutions, args.rate, args.workers, args.chunk_size)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    print('Stored {0} puzzles in {1} in {2:.1f} s ({3})'.format(sum(counts), args.output, time.perf_counter() - start,
+          ', '.join('{0} {1}'.format(tier or 'unrated', n) for tier, n in zip(GROUPS, counts))), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
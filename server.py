@@ -0,0 +1,411 @@
+"""
+    server.py
+
+    Author: Fabio Condomitti
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import signal
+import sys
+import time
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from math import isqrt
+from metrics import percentile
+from puzzle_io import CELLS, CHAR_TO_VAL, VAL_TO_CHAR
+from solver import BACKENDS, STATUS_NAMES, TIMEOUT, Board, count_solutions, find_contradiction, solve
+
+HOST = '127.0.0.1'
+PORT = 8765
+OPS = ('solve', 'unique', 'validate', 'stats')
+LATENCY_WINDOW = 10000          # latencies of the last requests kept for the percentiles of the stats
+LINE_LIMIT = 1 << 20            # longest request line accepted (bytes)
+MAX_DIM = 36                    # largest grid accepted by default: the tables of a grid grow as DIM ** 4
+
+
+def parse_puzzle(puzzle, max_dim=MAX_DIM):
+    """
+    Converts the puzzle of a request into a Board: an 81 characters string ('.' or '0' for the empty cells)
+    or a list of DIM rows of DIM values for any grid with square boxes, up to max_dim rows
+    :param puzzle: string or list
+    :param max_dim: int
+    :return: Board
+    """
+    if(isinstance(puzzle, str)):
+        cells = puzzle.encode('ascii', 'replace').translate(CHAR_TO_VAL)
+        if(len(cells) != CELLS or max(cells) > 9):
+            raise ValueError('not a valid 81 characters puzzle')
+        return Board(bytearray(cells))
+    if(isinstance(puzzle, list)):
+        DIM = len(puzzle)
+        if(DIM == 0 or isqrt(DIM) ** 2 != DIM):
+            raise ValueError('the grid must have a square number of rows')
+        if(DIM > max_dim):
+            raise ValueError('grids larger than {0}x{0} are not served'.format(max_dim))
+        if(any(not isinstance(row, list) or len(row) != DIM for row in puzzle)):
+            raise ValueError('the grid must have {0} values per row'.format(DIM))
+        if(any(type(v) is not int or v < 0 or v > DIM for row in puzzle for v in row)):
+            raise ValueError('the values must be integers between 0 and {0}'.format(DIM))
+        return Board(bytearray(v for row in puzzle for v in row), DIM)
+    raise ValueError('missing puzzle: an 81 characters string or a list of rows')
+
+def format_solution(cells, DIM, puzzle):
+    """
+    Returns the solution in the same form as the puzzle of the request
+    :param cells: bytes
+    :param DIM: int
+    :param puzzle: string or list
+    :return: string or list
+    """
+    if(isinstance(puzzle, str)):
+        return cells.translate(VAL_TO_CHAR).decode('ascii')
+    return [list(cells[i:i + DIM]) for i in range(0, DIM * DIM, DIM)]
+
+def run_job(op, cells, DIM, options):
+    """
+    Runs a request on a puzzle:
+    'solve'    -> solves it within the timeout and max_nodes of the request
+    'unique'   -> counts its solutions, up to 2, within the timeout of the request
+    'validate' -> looks for repeated givens or a contradiction found by propagating the singles
+    :param op: string
+    :param cells: bytes
+    :param DIM: int
+    :param options: dict
+    :return: dict
+    """
+    board = Board(bytearray(cells), DIM)
+    if(op == 'solve'):
+        result = solve(board, DIM, options.get('backend', 'bitmask'), timeout=options.get('timeout'),
+                       max_nodes=options.get('max_nodes'))
+        reply = {'status': STATUS_NAMES[result.status], 'nodes': result.nodes, 'solve_ms': result.elapsed * 1e3}
+        if(result):
+            reply['solution'] = bytes(board.cells)
+        return reply
+    if(op == 'unique'):
+        n = count_solutions(board, 2, timeout=options.get('timeout'))
+        if(n is None):
+            return {'status': STATUS_NAMES[TIMEOUT]}
+        return {'solutions': n, 'unique': n == 1}
+    status = find_contradiction(board)
+    return {'valid': status is None, 'status': STATUS_NAMES[status] if status is not None else 'unknown'}
+
+def run_batch(jobs):
+    """
+    Worker job: runs a batch of requests. A request that fails gets an error reply of its own, so the other
+    requests of the batch are still answered
+    :param jobs: list of (string, bytes, int, dict)
+    :return: list of dict
+    """
+    replies = []
+    for job in jobs:
+        try:
+            replies.append(run_job(*job))
+        except Exception as e:
+            replies.append({'error': 'solver failure: {0}'.format(e)})
+    return replies
+
+
+class SolverServer:
+    """
+    This class serves solver requests, one JSON object per line, over a Unix socket or a local TCP port.
+    Requests wait in a bounded queue: while every worker slot is busy they pile up there and the next free
+    slot takes up to batch_size of them at once, so a busy server pays one process round trip for many
+    puzzles. When the queue is full the connections stop being read, which pushes back on the clients
+    """
+    def __init__(self, workers=1, batch_size=64, batch_delay=0.0, max_pending=1024, window=256, timeout=None,
+                 max_dim=MAX_DIM):
+        """
+        SolverServer constructor
+        :param workers: int -> worker processes
+        :param batch_size: int -> most requests handed to a worker at a time
+        :param batch_delay: float -> s waited for more requests before handing a batch over
+        :param max_pending: int -> requests queued before the connections stop being read
+        :param window: int -> requests of a connection in progress at the same time
+        :param timeout: float or None -> s, default timeout of the solve and unique requests
+        :param max_dim: int -> largest grid accepted
+        :return: None
+        """
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_pending = max_pending
+        self.window = window
+        self.timeout = timeout
+        self.max_dim = max_dim
+        self.pool = None
+        self.queue = None                   # (job, future) waiting for a worker
+        self.slots = None                   # batches that can be in progress at the same time
+        self.running = set()                # tasks of the batches in progress
+        self.started = time.time()
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched = 0                    # requests handed to the workers
+        self.in_flight = 0                  # batches being run by the workers
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    async def serve(self, host=HOST, port=PORT, unix=None, ready=None):
+        """
+        Starts the worker processes and serves the requests until cancelled, or until SIGTERM
+        :param host: string
+        :param port: int
+        :param unix: string or None -> path of the Unix socket, used instead of TCP
+        :param ready: callable or None -> called once the server accepts connections
+        :return: None
+        """
+        self.queue = asyncio.Queue(self.max_pending)
+        self.slots = asyncio.Semaphore(2 * self.workers)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            if(unix):
+                server = await asyncio.start_unix_server(self.handle, path=unix, limit=LINE_LIMIT)
+            else:
+                server = await asyncio.start_server(self.handle, host, port, limit=LINE_LIMIT)
+            dispatcher = asyncio.create_task(self.dispatch())
+            try:
+                async with server:
+                    if(ready is not None):
+                        ready()
+                    await server.serve_forever()
+            finally:
+                dispatcher.cancel()
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            if(unix and os.path.exists(unix)):
+                os.unlink(unix)
+
+    async def dispatch(self):
+        """
+        Hands the queued requests to the workers in batches, as soon as a worker slot is free
+        :return: None
+        """
+        while(True):
+            await self.slots.acquire()
+            batch = [await self.queue.get()]
+            if(self.batch_delay > 0 and self.queue.qsize() < self.batch_size):
+                await asyncio.sleep(self.batch_delay)    # lets the requests arriving close together join the batch
+            while(len(batch) < self.batch_size and not self.queue.empty()):
+                batch.append(self.queue.get_nowait())
+            task = asyncio.create_task(self.run(batch))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    async def run(self, batch):
+        """
+        Runs a batch on a worker process and hands each reply to the request waiting for it
+        :param batch: list of (job, asyncio.Future)
+        :return: None
+        """
+        self.batches += 1
+        self.batched += len(batch)
+        self.in_flight += 1
+        pool = self.pool
+        try:
+            replies = await asyncio.get_running_loop().run_in_executor(pool, run_batch, [job for job, future in batch])
+        except BrokenProcessPool as e:
+            # a worker died: the pool refuses every later job, so the first batch to see it replaces the pool
+            if(self.pool is pool):
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+                pool.shutdown(wait=False, cancel_futures=True)
+            replies = [{'error': 'worker failure: {0}'.format(e)} for job in batch]
+        except Exception as e:
+            replies = [{'error': 'worker failure: {0}'.format(e)} for job in batch]
+        finally:
+            self.in_flight -= 1
+            self.slots.release()
+        for (job, future), reply in zip(batch, replies):
+            if(not future.done()):
+                future.set_result(reply)
+
+    async def handle(self, reader, writer):
+        """
+        Serves a connection: requests are read and answered as they come, so replies can be out of order
+        and carry the id of their request. At most window requests of the connection are in progress
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        :return: None
+        """
+        self.connections += 1
+        window = asyncio.Semaphore(self.window)
+        tasks = set()
+        try:
+            while(True):
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    self.errors += 1
+                    writer.write(b'{"error": "request line too long"}\n')
+                    break
+                if(not line):
+                    break
+                if(not line.strip()):
+                    continue
+                await window.acquire()
+                start = time.perf_counter()
+                # the next line is read only once this request is queued: a full queue stops the reading
+                request, future, DIM = await self.accept(line)
+                task = asyncio.create_task(self.answer(request, future, DIM, start, writer, window))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if(tasks):
+                await asyncio.gather(*tasks)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.connections -= 1
+            writer.close()
+
+    async def accept(self, line):
+        """
+        Reads a request line and queues its job for the workers, waiting for a free place in the queue. The
+        replies known right away (stats and errors) are set on the future at once
+        :param line: bytes
+        :return: (dict or None, asyncio.Future, int) -> the request, the future of its reply and the size of its grid
+        """
+        future = asyncio.get_running_loop().create_future()
+        request = None
+        DIM = 0
+        try:
+            request = json.loads(line)
+            if(not isinstance(request, dict)):
+                raise ValueError('a request must be a JSON object')
+            job = self.check(request)
+            if(job is None):
+                future.set_result(self.stats())
+            else:
+                DIM = job[2]
+                await self.queue.put((job, future))
+        except ValueError as e:
+            future.set_result({'error': str(e)})
+        except Exception as e:             # a request must never leave its client without a reply
+            future.set_result({'error': 'internal error: {0}'.format(e)})
+        return request, future, DIM
+
+    async def answer(self, request, future, DIM, start, writer, window):
+        """
+        Waits for the reply of a request and writes it
+        :param request: dict or None
+        :param future: asyncio.Future -> the reply
+        :param DIM: int
+        :param start: float -> time the request was read
+        :param writer: asyncio.StreamWriter
+        :param window: asyncio.Semaphore -> released once the reply is written
+        :return: None
+        """
+        try:
+            try:
+                reply = await future
+                if('solution' in reply):
+                    reply['solution'] = format_solution(reply['solution'], DIM, request['puzzle'])
+            except Exception as e:
+                reply = {'error': 'internal error: {0}'.format(e)}
+            if('error' in reply):
+                self.errors += 1
+            if(isinstance(request, dict) and 'id' in request):
+                reply['id'] = request['id']
+            writer.write(json.dumps(reply).encode() + b'\n')
+            await writer.drain()
+        finally:
+            window.release()
+        self.requests += 1
+        self.latencies.append(time.perf_counter() - start)
+
+    def check(self, request):
+        """
+        Checks a request and returns the job the workers run for it
+        :param request: dict
+        :return: (string, bytes, int, dict) or None for the stats, answered without the workers
+        """
+        op = request.get('op', 'solve')
+        if(not isinstance(op, str) or op not in OPS):
+            raise ValueError('unknown op {0}: use one of {1}'.format(op, ', '.join(OPS)))
+        if(op == 'stats'):
+            return None
+
+        options = {}
+        if(op == 'solve' or op == 'unique'):
+            timeout = request.get('timeout', self.timeout)
+            if(timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float))
+                                        or not math.isfinite(timeout) or timeout <= 0)):
+                raise ValueError('timeout must be a positive number of seconds')
+            options['timeout'] = timeout
+        if(op == 'solve'):
+            backend = request.get('backend', 'bitmask')
+            if(not isinstance(backend, str) or backend not in BACKENDS):
+                raise ValueError('unknown backend {0}: use one of {1}'.format(backend, ', '.join(BACKENDS)))
+            max_nodes = request.get('max_nodes')
+            if(max_nodes is not None and (type(max_nodes) is not int or max_nodes < 0)):
+                raise ValueError('max_nodes must be a non negative integer')
+            options.update(backend=backend, max_nodes=max_nodes)
+        board = parse_puzzle(request.get('puzzle'), self.max_dim)
+        return (op, bytes(board.cells), board.dim, options)
+
+    def stats(self):
+        """
+        Returns the state of the server: queue depth, batches, request counters and the latency percentiles
+        of the last LATENCY_WINDOW requests (from the request read to its reply written)
+        :return: dict
+        """
+        uptime = time.time() - self.started
+        ordered = sorted(self.latencies)
+        return {
+            'uptime_s': uptime,
+            'workers': self.workers,
+            'connections': self.connections,
+            'requests': self.requests,
+            'errors': self.errors,
+            'queue_depth': self.queue.qsize(),
+            'in_flight_batches': self.in_flight,
+            'batches': self.batches,
+            'mean_batch': self.batched / self.batches if self.batches else 0.0,
+            'requests_per_s': self.requests / uptime if uptime else 0.0,
+            'latency_ms': {
+                'p50': percentile(ordered, 50) * 1e3,
+                'p95': percentile(ordered, 95) * 1e3,
+                'p99': percentile(ordered, 99) * 1e3,
+                'max': (ordered[-1] if ordered else 0.0) * 1e3,
+            },
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description='Sudoku solving service: newline-delimited JSON over a Unix socket or local TCP')
+    parser.add_argument('-u', '--unix', help='path of the Unix socket to listen on (default: TCP)')
+    parser.add_argument('--host', default=HOST, help='TCP address to listen on (default: {0})'.format(HOST))
+    parser.add_argument('-p', '--port', type=int, default=PORT, help='TCP port (default: {0})'.format(PORT))
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes (default: all the cores)')
+    parser.add_argument('-b', '--batch-size', type=int, default=64, help='most requests handed to a worker at a time (default: 64)')
+    parser.add_argument('-d', '--batch-delay', type=float, default=0.0, help='ms waited for more requests before handing a batch over (default: 0, '
+                        'batches only form while the workers are busy)')
+    parser.add_argument('-q', '--max-pending', type=int, default=1024, help='requests queued before the clients are pushed back (default: 1024)')
+    parser.add_argument('-t', '--timeout', type=float, help='default timeout of a solve or unique request in seconds')
+    parser.add_argument('-m', '--max-dim', type=int, default=MAX_DIM, help='side of the largest grid accepted (default: {0})'.format(MAX_DIM))
+    args = parser.parse_args()
+
+    if(args.workers < 1 or args.batch_size < 1 or args.max_pending < 1 or args.max_dim < 1):
+        parser.error('workers, batch size, max pending and max dim must be positive')
+    if(args.batch_delay < 0 or (args.timeout is not None and (not math.isfinite(args.timeout) or args.timeout <= 0))):
+        parser.error('batch delay must not be negative and timeout must be positive')
+
+    server = SolverServer(args.workers, args.batch_size, args.batch_delay / 1e3, args.max_pending, timeout=args.timeout,
+                          max_dim=args.max_dim)
+    where = args.unix if args.unix else '{0}:{1}'.format(args.host, args.port)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix,
+                                 ready=lambda: print('Serving on {0} with {1} workers'.format(where, args.workers), file=sys.stderr)))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    except OSError as e:
+        parser.error(str(e))
+
+if __name__ == "__main__":
+    main()
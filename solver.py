@@ -4,28 +4,117 @@
     Author: Fabio Condomitti
 """
 
-from math import floor
+import time
+
+from collections import OrderedDict
+from itertools import permutations, product
+from math import factorial, isqrt
+from puzzle_io import CELLS, CHAR_TO_VAL, VAL_TO_CHAR
+
+# status codes of solve_many() and of the results of solve()
+SOLVED = 0
+UNSOLVABLE = 1
+MULTIPLE = 2
+TIMEOUT = 3                     # the search was stopped by the timeout
+NODE_LIMIT = 4                  # the search was stopped after max_nodes guesses
+CANCELLED = 5                   # the search was stopped by the cancellation token
+INVALID = 6                     # a given is repeated in a unit or is not a digit of the grid
+STATUS_NAMES = ('solved', 'unsolvable', 'multiple', 'timeout', 'node limit', 'cancelled', 'invalid')
+
+class Geometry:
+    """
+    This class holds the tables of a DIMxDIM board with nxn boxes (DIM = n * n), computed once so that nobody
+    has to do it again. Cell k = row * DIM + col; units are the rows (0..DIM-1), the columns (DIM..2*DIM-1)
+    and the boxes (2*DIM..3*DIM-1)
+    """
+    def __init__(self, DIM):
+        """
+        Geometry constructor
+        :param DIM: int -> a perfect square
+        :return: None
+        """
+        n = isqrt(DIM)
+        if(DIM < 1 or n * n != DIM):
+            raise ValueError('the grid dimension must be a perfect square, not {0}'.format(DIM))
+        area = DIM * DIM
+        self.dim = DIM
+        self.box = n                            # side of a box
+        self.full = (1 << DIM) - 1              # mask with all the digits set
+        # row, column and box of every cell, the units as tuples of cells, the 3 units of every cell and the
+        # peers (cells sharing a unit) of every cell
+        self.row_of = tuple(k // DIM for k in range(0, area))
+        self.col_of = tuple(k % DIM for k in range(0, area))
+        self.box_of = tuple((k // (n * DIM)) * n + (k % DIM) // n for k in range(0, area))
+        self.units = tuple(tuple(k for k in range(0, area) if of[k] == u)
+                           for of in (self.row_of, self.col_of, self.box_of) for u in range(0, DIM))
+        self.cell_units = tuple((self.row_of[k], DIM + self.col_of[k], 2 * DIM + self.box_of[k]) for k in range(0, area))
+        self.peers = tuple(tuple(sorted(set(p for u in self.cell_units[k] for p in self.units[u]) - {k}))
+                           for k in range(0, area))
+        # the same tables in the (index, row, col, box) form used to build the digit masks
+        self.cells = tuple((k, self.row_of[k], self.col_of[k], self.box_of[k]) for k in range(0, area))
+        # every intersection of a row or column with a box, as (cells, rest of the box, rest of the line)
+        self.segments = []
+        for b in range(0, DIM):
+            box = self.units[2 * DIM + b]
+            for line in self.units[:2 * DIM]:
+                part = tuple(k for k in line if k in box)
+                if(part):
+                    self.segments.append((part, tuple(k for k in box if k not in part),
+                                          tuple(k for k in line if k not in part)))
+        self.segments = tuple(self.segments)
+        # locked candidates cost more than the guesses they save on 9x9 boards, not on larger ones
+        self.locked = n > 3
+
+_GEOMETRIES = {}
+
+def geometry(DIM):
+    """
+    Returns the tables of a DIMxDIM board, building them the first time
+    :param DIM: int
+    :return: Geometry
+    """
+    geo = _GEOMETRIES.get(DIM)
+    if(geo is None):
+        geo = _GEOMETRIES[DIM] = Geometry(DIM)
+    return geo
+
+# the tables of the 9x9 board, used everywhere the size is fixed: 27 units and 20 peers per cell
+GEO = geometry(9)
+ROW_OF = GEO.row_of
+COL_OF = GEO.col_of
+BOX_OF = GEO.box_of
+UNITS = GEO.units
+CELL_UNITS = GEO.cell_units
+PEERS = GEO.peers
+
+# a puzzle whose symmetries leave more candidate transforms than this is not canonicalized (nor cached)
+CANONICAL_LIMIT = 2048
 
 def print_grid(gr):
     """
-    Prints a sudoku grid
+    Prints a sudoku grid of any size (9x9, 16x16, 25x25...)
     :param gr: 2D list
     :return: None
     """
-    for i in range(0,9):
-        if((i % 3) == 0):
-            print('- - - - - - - - - - - - - - - -')
-        for j in range(0,9):
-            if((j % 3) == 0):
+    DIM = len(gr)
+    n = isqrt(DIM)
+    width = len(str(DIM))
+    length = n * (1 + n * (width + 2)) + 1      # n boxes of n cells, each with its left border, and the right border
+    line = ('- ' * length)[:length]
+    for i in range(0, DIM):
+        if((i % n) == 0):
+            print(line)
+        for j in range(0, DIM):
+            if((j % n) == 0):
                 print('|', end='')
             
             val = str(gr[i][j])
             if(val == '0'):
                 val = ' '
             
-            print(' ' + val + ' ', end = '')
+            print(' ' + val.rjust(width) + ' ', end = '')
         print('|')
-    print('- - - - - - - - - - - - - - - -')
+    print(line)
 
 def find_empty_cells(gr):
     """
@@ -34,20 +123,20 @@ def find_empty_cells(gr):
     :return: list
     """
     l = list()
-    for i in range(0,9):
-        for j in range(0,9):
+    for i in range(0, len(gr)):
+        for j in range(0, len(gr[i])):
             if(gr[i][j] == 0):
                 l.append([i, j])
     return l
 
 def check_dim(gr, DIM):
     """
-    Checks if it is a 9x9 grid 
+    Checks if it is a DIMxDIM grid, with DIM a perfect square (9, 16, 25...)
     :param gr: 2D list
     :return: None
     """
     l = len(gr)
-    if(l != DIM):
+    if(l != DIM or isqrt(DIM) ** 2 != DIM):
         return False
 
     for i in range(0, DIM):
@@ -55,71 +144,1303 @@ def check_dim(gr, DIM):
             return False 
     return True
     
-def solve(gr, DIM):
+class Board:
     """
-    Solves the sudoku
-    :param gr: 2D list
-    :return: None
+    This class is a compact board: the cell values are stored row by row in a bytearray (0 -> empty).
+    Boards are 9x9 unless another dimension is given
+    """
+    __slots__ = ('cells', 'dim')
+
+    def __init__(self, cells=None, DIM=9):
+        """
+        Board constructor
+        :param cells: bytes-like with DIM * DIM values between 0 and DIM (a bytearray is used as it is, without
+                      a copy), an empty board if None
+        :param DIM: int
+        :return: None
+        """
+        self.dim = DIM
+        if(cells is None):
+            self.cells = bytearray(DIM * DIM)
+        else:
+            self.cells = cells if isinstance(cells, bytearray) else bytearray(cells)
+            if(len(self.cells) != DIM * DIM or max(self.cells) > DIM):
+                raise ValueError('a board needs {0} values between 0 and {1}'.format(DIM * DIM, DIM))
+
+    @classmethod
+    def from_grid(cls, gr):
+        """
+        Builds a board from a square 2D list
+        :param gr: 2D list
+        :return: Board
+        """
+        return cls(bytearray(v for row in gr for v in row), len(gr))
+
+    @classmethod
+    def from_string(cls, s):
+        """
+        Builds a board from an 81 characters string ('.' or '0' for the empty cells)
+        :param s: string
+        :return: Board
+        """
+        return cls(bytearray(s, 'ascii').translate(CHAR_TO_VAL))
+
+    def to_grid(self):
+        """
+        Converts the board to a 2D list
+        :return: 2D list
+        """
+        return [list(self.cells[i:i + self.dim]) for i in range(0, len(self.cells), self.dim)]
+
+    def copy(self):
+        """
+        Returns an independent copy of the board
+        :return: Board
+        """
+        board = Board.__new__(Board)
+        board.cells = self.cells[:]
+        board.dim = self.dim
+        return board
+
+    def __getitem__(self, pos):
+        i, j = pos
+        return self.cells[i * self.dim + j]
+
+    def __setitem__(self, pos, val):
+        i, j = pos
+        self.cells[i * self.dim + j] = val
+
+    def __eq__(self, other):
+        return isinstance(other, Board) and self.cells == other.cells
+
+    def __str__(self):
+        return self.cells.translate(VAL_TO_CHAR).decode()
+
+class SolveStats:
     """
+    This class collects the counters and the phase timers of solver runs: pass one to solve(), solution_of(),
+    count_solutions() or is_valid() to fill it. Without it the solvers run with no instrumentation at all
+    """
+    def __init__(self, callback=None):
+        """
+        SolveStats constructor
+        :param callback: function or None -> called as callback(event, cell, digit, depth) with event 'guess',
+                         'backtrack' or 'solution' (cell and digit are None for a solution)
+        :return: None
+        """
+        self.guesses = 0            # digits tried in cells that had more than one candidate
+        self.placements = 0         # digits written, by propagation or by guesses
+        self.backtracks = 0         # guesses taken back
+        self.checks = 0             # candidate checks: is_valid() calls or candidate masks read by the bitmask search
+        self.max_depth = 0          # most guesses in progress at the same time
+        self.setup_time = 0.0       # s spent building the masks or the exact-cover matrix
+        self.search_time = 0.0      # s spent searching
+        self.callback = callback
+
+    def add(self, other):
+        """
+        Adds the counters and the timers of another run to these ones
+        :param other: SolveStats
+        :return: None
+        """
+        self.guesses += other.guesses
+        self.placements += other.placements
+        self.backtracks += other.backtracks
+        self.checks += other.checks
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.setup_time += other.setup_time
+        self.search_time += other.search_time
+
+    def __str__(self):
+        return ('placements {0}, guesses {1}, backtracks {2}, checks {3}, max depth {4}, '
+                'setup {5:.3f} ms, search {6:.3f} ms').format(self.placements, self.guesses, self.backtracks,
+                                                          self.checks, self.max_depth, self.setup_time * 1e3,
+                                                          self.search_time * 1e3)
+
+    def __getstate__(self):
+        # the callback stays in the process that created the stats
+        state = dict(self.__dict__)
+        state['callback'] = None
+        return state
+
+class SolveResult:
+    """
+    This class is the outcome of solve(): its status (SOLVED, UNSOLVABLE, INVALID, TIMEOUT, NODE_LIMIT or CANCELLED),
+    the guesses made (nodes of the search tree), the time spent and the stats passed to solve(), filled up
+    to the point where the search ended. It is true only when the grid has been solved
+    """
+    __slots__ = ('status', 'nodes', 'elapsed', 'stats')
+
+    def __init__(self, status, nodes, elapsed, stats=None):
+        """
+        SolveResult constructor
+        :param status: int
+        :param nodes: int
+        :param elapsed: float -> s
+        :param stats: SolveStats or None
+        :return: None
+        """
+        self.status = status
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.stats = stats
+
+    def __bool__(self):
+        return self.status == SOLVED
+
+    def __str__(self):
+        return '{0} after {1} nodes in {2:.3f} ms'.format(STATUS_NAMES[self.status], self.nodes, self.elapsed * 1e3)
+
+class _Stopped(Exception):
+    """
+    Raised inside the search to unwind it when its budget is over
+    """
+    def __init__(self, status):
+        Exception.__init__(self, STATUS_NAMES[status])
+        self.status = status
+
+class _Budget:
+    """
+    This class counts the nodes of a search and stops it when the time, the nodes or the cancellation token
+    say so. It is checked at every guess, so a cancelled search stops within one node
+    """
+    __slots__ = ('deadline', 'max_nodes', 'cancel', 'nodes')
+
+    def __init__(self, timeout=None, max_nodes=None, cancel=None):
+        """
+        _Budget constructor
+        :param timeout: float or None -> s from now
+        :param max_nodes: int or None
+        :param cancel: object with an is_set() method (threading.Event, multiprocessing.Event...) or None
+        :return: None
+        """
+        self.deadline = time.perf_counter() + timeout if timeout is not None else None
+        self.max_nodes = max_nodes
+        self.cancel = cancel
+        self.nodes = 0
+
+    def spend(self):
+        """
+        Counts a node, raising _Stopped when the budget is over
+        :return: None
+        """
+        self.nodes += 1
+        if(self.max_nodes is not None and self.nodes > self.max_nodes):
+            raise _Stopped(NODE_LIMIT)
+        if(self.deadline is not None and time.perf_counter() > self.deadline):
+            raise _Stopped(TIMEOUT)
+        if(self.cancel is not None and self.cancel.is_set()):
+            raise _Stopped(CANCELLED)
+
+def solve(gr, DIM, backend='bitmask', stats=None, timeout=None, max_nodes=None, cancel=None):
+    """
+    Solves the sudoku in place with the chosen backend:
+    'bitmask' -> singles propagation and backtracking on the most constrained cell, with a candidate mask
+                 per cell
+    'dlx'     -> Knuth's Algorithm X with Dancing Links on the exact-cover formulation
+    Any DIMxDIM grid with a perfect square DIM can be solved (9x9, 16x16, 25x25...).
+    If a SolveStats object is given it is filled with the counters and the timers of the run.
+    Givens repeated in a unit or out of 0..DIM are rejected before any search with the INVALID status.
+    The search gives up after timeout seconds, after max_nodes guesses or as soon as the cancel token is set
+    (from another thread or process); the grid is then left untouched
+    :param gr: 2D list or Board
+    :param DIM: int
+    :param backend: string
+    :param stats: SolveStats
+    :param timeout: float or None -> s
+    :param max_nodes: int or None
+    :param cancel: object with an is_set() method (threading.Event, multiprocessing.Event...) or None
+    :return: SolveResult -> true if the grid has been solved; None if the grid has a wrong dimension
+    """
+    if(backend not in BACKENDS):
+        raise ValueError('unknown solver backend: {0}'.format(backend))
+
     # dimension check
-    if(not check_dim(gr, DIM)):
-        print('ERROR in the grid dimension')
-        return
+    if(isinstance(gr, Board)):
+        board = gr
+        if(DIM != board.dim or isqrt(DIM) ** 2 != DIM):
+            print('ERROR in the grid dimension')
+            return
+    else:
+        if(not check_dim(gr, DIM)):
+            print('ERROR in the grid dimension')
+            return
+        try:
+            board = Board.from_grid(gr)
+        except ValueError:                  # a value out of 0..DIM is not a digit of the grid
+            return SolveResult(INVALID, 0, 0.0, stats)
 
-    available_cells = find_empty_cells(gr)
-    pos = 0
-    
-    while(pos < len(available_cells)):
-        i, j = available_cells[pos]
-        valid_num = False
+    start = time.perf_counter()
+    budget = _Budget(timeout, max_nodes, cancel)
+    try:
+        if(BACKENDS[backend](board.cells, DIM, stats, budget)):
+            status = SOLVED
+        else:
+            # the backends reject repeated givens before searching: tell them apart from the dead boards
+            status = UNSOLVABLE if check_givens(board.cells, DIM) else INVALID
+    except _Stopped as e:
+        status = e.status
+    result = SolveResult(status, budget.nodes, time.perf_counter() - start, stats)
+    if(not result):
+        return result
 
-        if(gr[i][j] == 0):
-            start = 1
+    if(board is not gr):
+        for i in range(0, DIM):
+            gr[i][:] = board.cells[i * DIM:(i + 1) * DIM]
+    return result
+
+def solution_of(gr, backend='bitmask', stats=None):
+    """
+    Solves a copy of a grid, leaving the grid untouched (handy as a job for a worker process)
+    :param gr: 2D list or Board
+    :param backend: string
+    :param stats: SolveStats
+    :return: Board or None if the grid has no solution
+    """
+    board = gr.copy() if isinstance(gr, Board) else Board.from_grid(gr)
+    if(solve(board, board.dim, backend, stats)):
+        return board
+    return None
+
+def check_givens(cells, DIM):
+    """
+    Checks in a single pass over the cells that no given is repeated in its row, column or box and that
+    every value is a digit of the grid
+    :param cells: bytearray -> flat board
+    :param DIM: int
+    :return: bool
+    """
+    rows = [0] * DIM
+    cols = [0] * DIM
+    boxes = [0] * DIM
+    for k, i, j, box in geometry(DIM).cells:
+        v = cells[k]
+        if(v == 0):
+            continue
+        if(v > DIM):
+            return False
+        bit = 1 << v
+        if((rows[i] | cols[j] | boxes[box]) & bit):
+            return False
+        rows[i] |= bit
+        cols[j] |= bit
+        boxes[box] |= bit
+    return True
+
+def find_contradiction(gr):
+    """
+    Looks for a proof that a sudoku of any size cannot be solved without searching it: repeated givens, then
+    the singles (and on large boards the locked candidates) propagated from the givens until a cell or a digit
+    of a unit is left without a place. It takes microseconds and catches most of the unsolvable boards entered
+    by hand
+    :param gr: 2D list or Board
+    :return: int or None -> INVALID, UNSOLVABLE, or None if no contradiction has been found
+    """
+    if(isinstance(gr, Board) and isqrt(gr.dim) ** 2 == gr.dim):
+        cells = gr.cells
+        DIM = gr.dim
+    elif(not isinstance(gr, Board) and check_dim(gr, len(gr))):
+        try:
+            cells = Board.from_grid(gr).cells
+        except ValueError:
+            return INVALID
+        DIM = len(gr)
+    else:
+        return INVALID
+
+    if(not check_givens(cells, DIM)):
+        return INVALID
+    geo = geometry(DIM)
+    cand, queue = build_candidates(cells, geo)
+    if(cand is None or not _propagate(cand, [], queue, geo)):
+        return UNSOLVABLE
+    return None
+
+def build_masks(cells, DIM):
+    """
+    Builds the digit masks of rows, columns and boxes (bit k set -> digit k + 1 used) and collects the
+    free cells. Python integers are as wide as needed, so the same masks serve any dimension
+    :param cells: bytearray -> flat board
+    :param DIM: int
+    :return: (list, list, list, list of (index, row, col, box))
+    """
+    rows = [0] * DIM
+    cols = [0] * DIM
+    boxes = [0] * DIM
+    available_cells = []
+
+    for cell in geometry(DIM).cells:
+        k, i, j, box = cell
+        if(cells[k] == 0):
+            available_cells.append(cell)
         else:
-            start = gr[i][j]
+            bit = 1 << (cells[k] - 1)
+            rows[i] |= bit
+            cols[j] |= bit
+            boxes[box] |= bit
+
+    return rows, cols, boxes, available_cells
+
+def build_candidates(cells, geo):
+    """
+    Builds the candidate mask of every cell (the digit of a given, the digits its units still miss for a
+    free cell) and queues the free cells left with a single candidate
+    :param cells: bytearray -> flat board
+    :param geo: Geometry
+    :return: (list or None, list) -> candidate masks, None if a given is repeated in a unit or is not a digit
+             of the grid or if a free cell has no candidate, and queue
+    """
+    queue = []
+    if(max(cells) > geo.dim):
+        return None, queue
+    rows, cols, boxes, available_cells = build_masks(cells, geo.dim)
+    cand = [(1 << v) >> 1 for v in cells]          # 0 for the free cells
+    # a repeated given sets its bit only once in the masks of the unit
+    givens = len(cells) - len(available_cells)
+    for masks in (rows, cols, boxes):
+        if(sum(bin(m).count('1') for m in masks) != givens):
+            return None, queue
+    for k, i, j, box in available_cells:
+        c = geo.full & ~(rows[i] | cols[j] | boxes[box])
+        if(c == 0):
+            return None, queue
+        cand[k] = c
+        if(c & (c - 1) == 0):
+            queue.append(k)
+    return cand, queue
+
+def solve_bitmask(cells, DIM, stats, budget=None):
+    """
+    Bitmask backend: every free cell keeps the mask of its candidates (bit k set -> digit k + 1 allowed), and
+    every change is recorded on a trail to be undone when a guess fails. A decided cell removes its digit from
+    its peers, then naked and hidden singles (and on boards larger than 9x9 locked candidates) are placed
+    until nothing changes, then the search branches on the free cell with the fewest candidates, preferring
+    the one whose units are the least filled. The board is written only when a solution is found
+    :param cells: bytearray -> flat board
+    :param DIM: int
+    :param stats: SolveStats or None
+    :param budget: _Budget or None
+    :return: bool
+    """
+    if(stats is not None):
+        start = time.perf_counter()
+    geo = geometry(DIM)
+    cand, queue = build_candidates(cells, geo)
+    found = []
+    if(stats is not None):
+        mid = time.perf_counter()
+        stats.setup_time += mid - start
+    try:
+        if(cand is not None):
+            _search(cand, [], queue, geo, stats, found, 1, budget=budget)
+    finally:
+        if(stats is not None):
+            stats.search_time += time.perf_counter() - mid
+    if(not found):
+        return False
+    cells[:] = found[0]
+    return True
+
+def solve_dlx(cells, DIM, stats, budget=None):
+    """
+    Dancing Links backend. Every candidate (row, col, digit) of a free cell is a row of the exact-cover
+    matrix and covers 4 columns: the cell, digit in the row, digit in the column and digit in the box
+    (4 * 81 = 324 columns for an empty 9x9 grid, 4 * 256 = 1024 for a 16x16 one; constraints already met
+    by the givens are left out).
+    The singles are propagated first, as in the bitmask backend: most dead boards are rejected before the
+    matrix is built, and the matrix only holds the cells and the candidates left.
+    The search always branches on the column with fewest rows, so its cost does not depend on where the
+    free cells are placed in the grid
+    :param cells: bytearray -> flat board
+    :param DIM: int
+    :param stats: SolveStats or None
+    :param budget: _Budget or None
+    :return: bool
+    """
+    if(stats is not None):
+        start = time.perf_counter()
+    geo = geometry(DIM)
+    cand, queue = build_candidates(cells, geo)
+    if(cand is None or not _propagate(cand, [], queue, geo, stats)):
+        if(stats is not None):
+            stats.setup_time += time.perf_counter() - start
+        return False
+    # the cells decided by the propagation become givens of the matrix
+    board = bytearray(cells)
+    for k in range(0, len(board)):
+        if(board[k] == 0 and cand[k] & (cand[k] - 1) == 0):
+            board[k] = cand[k].bit_length()
+    rows, cols, boxes, available_cells = build_masks(board, DIM)
+    area = DIM * DIM
+
+    # node 0 is the root, nodes 1..n are the column headers, the others are the matrix entries
+    column_of = {}
+    for k, i, j, box in available_cells:
+        column_of[k] = 0
+        for d in range(0, DIM):
+            bit = 1 << d
+            if(not rows[i] & bit):
+                column_of[area + i * DIM + d] = 0
+            if(not cols[j] & bit):
+                column_of[2 * area + j * DIM + d] = 0
+            if(not boxes[box] & bit):
+                column_of[3 * area + box * DIM + d] = 0
+
+    n = len(column_of)
+    L = [n] + list(range(0, n))
+    R = list(range(1, n + 1)) + [0]
+    U = list(range(0, n + 1))
+    D = list(range(0, n + 1))
+    C = list(range(0, n + 1))
+    S = [0] * (n + 1)
+    choice = [None] * (n + 1)
+    for k, key in enumerate(column_of, 1):
+        column_of[key] = k
+
+    for k, i, j, box in available_cells:
+        free = cand[k]
+        for d in range(0, DIM):
+            if(not free & (1 << d)):
+                continue
+            first = len(C)
+            for key in (k, area + i * DIM + d, 2 * area + j * DIM + d, 3 * area + box * DIM + d):
+                col = column_of[key]
+                node = len(C)
+                C.append(col)
+                U.append(U[col])
+                D.append(col)
+                D[U[col]] = node
+                U[col] = node
+                L.append(node - 1)
+                R.append(node + 1)
+                choice.append((k, d + 1))
+                S[col] += 1
+            L[first] = first + 3
+            R[first + 3] = first
+
+    def cover(col):
+        R[L[col]] = R[col]
+        L[R[col]] = L[col]
+        i = D[col]
+        while(i != col):
+            j = R[i]
+            while(j != i):
+                D[U[j]] = D[j]
+                U[D[j]] = U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(col):
+        i = U[col]
+        while(i != col):
+            j = L[i]
+            while(j != i):
+                S[C[j]] += 1
+                D[U[j]] = j
+                U[D[j]] = j
+                j = L[j]
+            i = U[i]
+        R[L[col]] = col
+        L[R[col]] = col
 
-        for num in range(start, len(gr) + 1):
-            if(is_valid(gr, available_cells[pos], num)):
-                gr[i][j] = num
-                pos += 1
-                valid_num = True
+    solution = []
+
+    def search():
+        # the columns covered so far are kept on an explicit stack as [column, row tried, guess, depth], so
+        # the depth of the search is not bounded by the recursion limit
+        stack = []
+        depth = 0
+        while(True):
+            if(R[0] == 0):
+                if(stats is not None and stats.callback):
+                    stats.callback('solution', None, None, depth)
+                return True
+
+            # branch on the column with the fewest remaining rows
+            col = R[0]
+            best = col
+            while(col != 0):
+                if(S[col] < S[best]):
+                    best = col
+                    if(S[best] < 2):
+                        break
+                col = R[col]
+
+            cover(best)
+            guess = S[best] > 1
+            if(stats is not None and guess and depth + 1 > stats.max_depth):
+                stats.max_depth = depth + 1
+            stack.append([best, best, guess, depth])
+
+            # take back the row tried last and move to the next one of its column, going up the stack while
+            # the columns have none left
+            while(stack):
+                frame = stack[-1]
+                col, r, guess, depth = frame
+                if(r != col):
+                    solution.pop()
+                    j = L[r]
+                    while(j != r):
+                        uncover(C[j])
+                        j = L[j]
+                    if(guess and stats is not None):
+                        stats.backtracks += 1
+                        if(stats.callback):
+                            stats.callback('backtrack', choice[r][0], choice[r][1], depth + 1)
+                r = D[r]
+                if(r != col):
+                    break
+                uncover(col)
+                stack.pop()
+            else:
+                return False
+
+            frame[1] = r
+            if(guess and budget is not None):
+                budget.spend()
+            if(stats is not None):
+                stats.placements += 1
+                if(guess):
+                    stats.guesses += 1
+                    if(stats.callback):
+                        stats.callback('guess', choice[r][0], choice[r][1], depth + 1)
+            solution.append(r)
+            j = R[r]
+            while(j != r):
+                cover(C[j])
+                j = R[j]
+            depth += guess
+
+    if(stats is not None):
+        mid = time.perf_counter()
+        stats.setup_time += mid - start
+    try:
+        found = search()
+    finally:
+        if(stats is not None):
+            stats.search_time += time.perf_counter() - mid
+    if(not found):
+        return False
+
+    for node in solution:
+        k, num = choice[node]
+        board[k] = num
+    cells[:] = board
+    return True
+
+def _propagate(cand, trail, queue, geo, stats=None):
+    """
+    Removes the digit of every queued cell from its peers, queueing the peers left with one candidate
+    (naked singles), then places hidden singles (digits with one possible cell in a row, column or box) and
+    on large boards eliminates locked candidates, until a fixpoint is reached
+    :param cand: list of int masks
+    :param trail: list of (cell, old mask)
+    :param queue: list of decided cells whose digit has not been removed from their peers yet
+    :param geo: Geometry
+    :param stats: SolveStats or None
+    :return: bool -> False on a contradiction
+    """
+    full = geo.full
+    peers = geo.peers
+    while(True):
+        # naked singles
+        while(queue):
+            k = queue.pop()
+            bit = cand[k]
+            if(stats is not None):
+                stats.placements += 1
+                stats.checks += len(peers[k])
+            for p in peers[k]:
+                c = cand[p]
+                if(c & bit):
+                    if(c == bit):           # two peers need the same digit
+                        return False
+                    trail.append((p, c))
+                    c ^= bit
+                    cand[p] = c
+                    if(c & (c - 1) == 0):
+                        queue.append(p)
+
+        # hidden singles: digits seen once but not twice among the candidates of a unit
+        if(stats is not None):
+            stats.checks += 3 * len(cand)   # every cell is seen by its row, column and box
+        for unit in geo.units:
+            once = 0
+            twice = 0
+            for k in unit:
+                c = cand[k]
+                twice |= once & c
+                once |= c
+            if(once != full):               # a digit has no place left in the unit
+                return False
+            hidden = once & ~twice
+            if(hidden == 0):
+                continue
+            for k in unit:
+                c = cand[k]
+                bit = c & hidden
+                if(bit == 0 or c == bit):
+                    continue
+                if(bit & (bit - 1)):        # two digits need the same cell
+                    return False
+                trail.append((k, c))
+                cand[k] = bit
+                queue.append(k)
+        if(queue):
+            continue
+
+        if(not geo.locked):
+            return True
+        ok, changed = _locked_candidates(cand, trail, queue, geo, stats)
+        if(not ok):
+            return False
+        if(not changed):
+            return True
+
+def _locked_candidates(cand, trail, queue, geo, stats=None):
+    """
+    Eliminates locked candidates at the first intersection of a line and a box that has some: a digit that
+    the free cells of the intersection hold but the rest of the box does not is removed from the rest of the
+    line (pointing), and a digit missing from the rest of the line is removed from the rest of the box
+    (claiming)
+    :param cand: list of int masks
+    :param trail: list of (cell, old mask)
+    :param queue: list of decided cells
+    :param geo: Geometry
+    :param stats: SolveStats or None
+    :return: (bool, bool) -> False on a contradiction, and whether any candidate was eliminated
+    """
+    for part, rest_box, rest_line in geo.segments:
+        digits = 0
+        for k in part:
+            c = cand[k]
+            if(c & (c - 1)):
+                digits |= c
+        if(digits == 0):
+            continue
+        in_box = 0
+        for k in rest_box:
+            in_box |= cand[k]
+        in_line = 0
+        for k in rest_line:
+            in_line |= cand[k]
+        if(stats is not None):
+            stats.checks += len(part) + len(rest_box) + len(rest_line)
+
+        changed = False
+        for locked, rest in ((digits & ~in_box, rest_line), (digits & ~in_line, rest_box)):
+            if(locked == 0):
+                continue
+            for p in rest:
+                c = cand[p]
+                if(c & locked):
+                    if(c & ~locked == 0):
+                        return False, changed
+                    trail.append((p, c))
+                    c &= ~locked
+                    cand[p] = c
+                    if(c & (c - 1) == 0):
+                        queue.append(p)
+                    changed = True
+        if(changed):
+            return True, True
+    return True, False
+
+def _choose(cand, geo):
+    """
+    Returns the free cell with the fewest candidates (minimum remaining values). Ties are broken in favour
+    of the cell whose row, column and box have the most free cells, where a guess constrains the most
+    :param cand: list of int masks
+    :param geo: Geometry
+    :return: int or None if every cell is decided
+    """
+    best_count = geo.dim + 1
+    tied = []
+    for k, c in enumerate(cand):
+        if(c & (c - 1)):
+            count = bin(c).count('1')
+            if(count < best_count):
+                best_count = count
+                tied = [k]
+            elif(count == best_count):
+                tied.append(k)
+    if(len(tied) < 2):
+        return tied[0] if tied else None
+
+    free = {}                               # free cells of the units met so far
+    best = None
+    best_free = -1
+    for k in tied:
+        n = 0
+        for u in geo.cell_units[k]:
+            f = free.get(u)
+            if(f is None):
+                f = 0
+                for p in geo.units[u]:
+                    c = cand[p]
+                    if(c & (c - 1)):
+                        f += 1
+                free[u] = f
+            n += f
+        if(n > best_free):
+            best = k
+            best_free = n
+    return best
+
+def _search(cand, trail, queue, geo, stats, found, limit, depth=0, budget=None):
+    """
+    Propagates the queued cells and then branches on the most constrained free cell. Every complete board
+    reached is copied in found; the search stops as soon as limit solutions have been found, or raises
+    _Stopped when the budget is over. The guesses in progress are kept on an explicit stack, so the depth
+    of the search is not bounded by the recursion limit (an empty 36x36 board needs over a thousand)
+    :param cand: list of int masks
+    :param trail: list of (cell, old mask)
+    :param queue: list of decided cells
+    :param geo: Geometry
+    :param stats: SolveStats or None
+    :param found: list of bytes
+    :param limit: int
+    :param depth: int -> guesses in progress
+    :param budget: _Budget or None
+    :return: bool -> True if the limit has been reached
+    """
+    stack = []                          # [cell, candidates left, trail mark, digit bit tried] of every guess
+    ok = _propagate(cand, trail, queue, geo, stats)
+    while(True):
+        if(ok):
+            k = _choose(cand, geo)
+            if(k is None):
+                found.append(bytes(c.bit_length() for c in cand))
+                if(stats is not None and stats.callback):
+                    stats.callback('solution', None, None, depth + len(stack))
+                if(len(found) >= limit):
+                    return True
+            else:
+                stack.append([k, cand[k], len(trail), 0])
+                if(stats is not None and depth + len(stack) > stats.max_depth):
+                    stats.max_depth = depth + len(stack)
+
+        # take back the last guess and move to the next candidate of its cell, going up the stack while
+        # the cells have none left
+        while(stack):
+            frame = stack[-1]
+            k, free, mark, bit = frame
+            if(bit):
+                while(len(trail) > mark):
+                    p, c = trail.pop()
+                    cand[p] = c
+                if(stats is not None):
+                    stats.backtracks += 1
+                    if(stats.callback):
+                        stats.callback('backtrack', k, bit.bit_length(), depth + len(stack))
+            if(free):
                 break
+            stack.pop()
+        else:
+            return False
 
-        if(not valid_num):    
-            gr[i][j] = 0
-            pos -= 1
-            i = available_cells[pos][0]
-            j = available_cells[pos][1]
-            gr[i][j] += 1
+        bit = free & -free              # lowest candidate digit
+        frame[1] = free ^ bit
+        frame[3] = bit
+        if(budget is not None):
+            budget.spend()
+        if(stats is not None):
+            stats.guesses += 1
+            if(stats.callback):
+                stats.callback('guess', k, bit.bit_length(), depth + len(stack))
+        trail.append((k, cand[k]))
+        cand[k] = bit
+        ok = _propagate(cand, trail, [k], geo, stats)
 
-def is_valid(gr, pos, num):
+def count_solutions(gr, limit=2, stats=None, timeout=None, max_nodes=None, cancel=None):
     """
-    Checks if a given number can be put in the pos (i, j) position of the grid 
-    :param gr: 2D list
-    :param pos: (row, col)
-    :param num: int
+    Counts the solutions of a sudoku of any size with the bitmask search, stopping as soon as limit of them
+    have been found. The grid is not modified. As in solve(), the search gives up after timeout seconds, after
+    max_nodes guesses or as soon as the cancel token is set
+    :param gr: 2D list or Board
+    :param limit: int
+    :param stats: SolveStats or None
+    :param timeout: float or None -> s
+    :param max_nodes: int or None
+    :param cancel: object with an is_set() method (threading.Event, multiprocessing.Event...) or None
+    :return: int or None -> number of solutions, at most limit; None if the search gave up before knowing it
+    """
+    if(isinstance(gr, Board) and isqrt(gr.dim) ** 2 == gr.dim):
+        cells = gr.cells[:]
+        DIM = gr.dim
+    elif(not isinstance(gr, Board) and check_dim(gr, len(gr))):
+        try:
+            cells = Board.from_grid(gr).cells
+        except ValueError:                  # a value out of 0..DIM: no solution
+            return 0
+        DIM = len(gr)
+    else:
+        print('ERROR in the grid dimension')
+        return 0
+
+    if(stats is not None):
+        start = time.perf_counter()
+    geo = geometry(DIM)
+    cand, queue = build_candidates(cells, geo)
+    found = []
+    if(stats is not None):
+        mid = time.perf_counter()
+        stats.setup_time += mid - start
+    try:
+        if(cand is not None):
+            _search(cand, [], queue, geo, stats, found, limit, budget=_Budget(timeout, max_nodes, cancel))
+    except _Stopped:
+        return None
+    finally:
+        if(stats is not None):
+            stats.search_time += time.perf_counter() - mid
+    return len(found)
+
+def is_unique(gr):
+    """
+    Checks if a sudoku has exactly one solution
+    :param gr: 2D list or Board
     :return: bool
     """
-    
-    row = pos[0]
-    col = pos[1]
-    
-    for i in range(0, 9):
-        # test row
-        if(i != col and gr[row][i] == num):
+    return count_solutions(gr, 2) == 1
+
+def is_solution(gr):
+    """
+    Checks if a full DIMxDIM grid is a valid sudoku: every row, column and box holds the digits 1 to DIM
+    :param gr: 2D list or Board
+    :return: bool
+    """
+    if(isinstance(gr, Board)):
+        cells = gr.cells
+        DIM = gr.dim
+    else:
+        cells = [v for row in gr for v in row]
+        DIM = len(gr)
+    if(len(cells) != DIM * DIM or isqrt(DIM) ** 2 != DIM):
+        return False
+    digits = list(range(1, DIM + 1))
+    for unit in geometry(DIM).units:
+        if(sorted(cells[k] for k in unit) != digits):
             return False
-        # test col
-        if(i != row and gr[i][col] == num):
+    return True
+
+def solve_many(puzzles):
+    """
+    Solves a batch of 9x9 sudokus given as an (N, 81) array (0 -> empty cell). The candidate masks of all
+    the boards live in uint16 arrays and naked/hidden singles are placed on every board at once with
+    vectorized operations; only the boards on which propagation stalls are searched one by one.
+    Needs numpy
+    :param puzzles: numpy array (N, 81) or anything numpy can reshape to it
+    :return: (numpy array (N, 81) uint8, numpy array (N,) uint8) -> solutions and SOLVED, UNSOLVABLE or
+             MULTIPLE for each board. Unsolvable boards are returned unchanged, boards with more than one
+             solution hold the first solution found
+    """
+    import numpy as np
+
+    values = np.array(puzzles, dtype=np.uint8).reshape(-1, 81)
+    if(values.size and values.max() > 9):
+        raise ValueError('cell values must be between 0 and 9')
+
+    full = 0x1FF
+    bit_of = np.array([0] + [1 << d for d in range(0, 9)], dtype=np.uint16)
+    popcount = np.array([bin(m).count('1') for m in range(0, 512)], dtype=np.uint8)
+    digit_of = np.zeros(512, dtype=np.uint8)
+    digit_of[bit_of[1:]] = np.arange(1, 10)
+
+    unit_cells = np.array(UNITS)                # (27, 9)
+    cell_units = np.array(CELL_UNITS)           # (81, 3)
+
+    original = values.copy()
+    status = np.full(len(values), SOLVED, dtype=np.uint8)
+    active = np.arange(len(values))
+    stalled = []
+
+    while(len(active)):
+        v = values[active]
+        empty = v == 0
+        bits = bit_of[v]
+        unit_bits = bits[:, unit_cells]
+        used = np.bitwise_or.reduce(unit_bits, axis=2)                                   # (M, 27)
+        duplicated = (popcount[used] != np.count_nonzero(unit_bits, axis=2)).any(axis=1)
+
+        cand = np.bitwise_or.reduce(used[:, cell_units], axis=2)
+        cand = np.where(empty, ~cand & full, 0).astype(np.uint16)                       # (M, 81)
+        no_candidate = (empty & (cand == 0)).any(axis=1)
+
+        # hidden singles: digits seen once but not twice among the candidates of a unit
+        unit_cand = cand[:, unit_cells]
+        once = np.zeros(used.shape, dtype=np.uint16)
+        twice = np.zeros(used.shape, dtype=np.uint16)
+        for k in range(0, 9):
+            twice |= once & unit_cand[:, :, k]
+            once |= unit_cand[:, :, k]
+        no_place = ((once | used) != full).any(axis=1)
+        hidden = cand & np.bitwise_or.reduce((once & ~twice)[:, cell_units], axis=2)
+
+        place = np.where(empty & (popcount[cand] == 1), cand, hidden)
+        clash = (popcount[place] > 1).any(axis=1)           # two digits forced in the same cell
+
+        dead = duplicated | no_candidate | no_place | clash
+        progress = (place != 0).any(axis=1) & ~dead
+        solved = ~empty.any(axis=1) & ~dead
+
+        values[active[progress]] = np.where(place[progress] != 0, digit_of[place[progress]], v[progress])
+        status[active[dead]] = UNSOLVABLE
+        values[active[dead]] = original[active[dead]]
+        stalled.extend(active[~(progress | dead | solved)].tolist())
+        active = active[progress]
+
+    # boards on which the singles are not enough: search them, stopping at the second solution
+    for n in stalled:
+        cand, queue = build_candidates(bytearray(values[n].tobytes()), GEO)
+        found = []
+        if(cand is not None):
+            _search(cand, [], queue, GEO, None, found, 2)
+        if(not found):
+            status[n] = UNSOLVABLE
+            values[n] = original[n]
+        else:
+            values[n] = np.frombuffer(found[0], dtype=np.uint8)
+            if(len(found) > 1):
+                status[n] = MULTIPLE
+
+    return values, status
+
+def _tied_groups(items, key):
+    """
+    Sorts the items by key and splits them in runs of equal keys
+    :param items: iterable
+    :param key: function
+    :return: list of lists
+    """
+    groups = []
+    for item in sorted(items, key=key):
+        if(groups and key(groups[-1][0]) == key(item)):
+            groups[-1].append(item)
+        else:
+            groups.append([item])
+    return groups
+
+def _tied_orders(groups):
+    """
+    Returns every order of the items obtained by permuting each run of equal keys
+    :param groups: list of lists
+    :return: list of lists
+    """
+    return [[item for group in choice for item in group] for choice in product(*[permutations(g) for g in groups])]
+
+def _line_orders(sigs):
+    """
+    Finds the orders of 9 rows (or columns) that keep the bands together and sort the line signatures:
+    rows by signature inside each band, then bands by their sorted signatures
+    :param sigs: list of 9 signatures
+    :return: (tuple, int, function) -> the sorted signatures, how many orders produce them and a function
+             returning the list of those orders
+    """
+    bands = [_tied_groups(range(b * 3, b * 3 + 3), sigs.__getitem__) for b in range(0, 3)]
+    band_keys = [tuple(sigs[line] for group in bands[b] for line in group) for b in range(0, 3)]
+    band_groups = _tied_groups(range(0, 3), band_keys.__getitem__)
+
+    count = 1
+    for group in band_groups:
+        count *= factorial(len(group))
+    for groups in bands:
+        for group in groups:
+            count *= factorial(len(group))
+
+    def orders():
+        result = []
+        for band_order in _tied_orders(band_groups):
+            for lines in product(*[_tied_orders(bands[b]) for b in band_order]):
+                result.append([line for band in lines for line in band])
+        return result
+
+    first = [line for b in band_groups for band in b for group in bands[band] for line in group]
+    return tuple(sigs[line] for line in first), count, orders
+
+def canonical_form(cells):
+    """
+    Computes the canonical form of a 9x9 puzzle under the validity-preserving symmetries (transposition,
+    band/stack swaps, row/column swaps inside a band/stack: 3,359,232 transforms) and digit relabeling.
+    Only the transforms that sort the row and column signatures (clue counts per stack/band and frequencies
+    of the digits, which do not change under the symmetries) are tried, and among those the one giving the
+    smallest grid, with the digits renamed 1, 2, 3... in order of appearance, is the canonical form.
+    Puzzles with more than CANONICAL_LIMIT such transforms are not canonicalized
+    :param cells: bytes-like -> flat board
+    :return: (bytes, (list, bytes)) -> canonical cells and transform (canonical[k] = relabel[cells[index_map[k]]]),
+             or None
+    """
+    freq = [0] * 10
+    for v in cells:
+        freq[v] += 1
+    freq[0] = 0
+
+    row_sigs = []
+    col_sigs = []
+    for line in range(0, 9):
+        row = [cells[line * 9 + j] for j in range(0, 9)]
+        col = [cells[i * 9 + line] for i in range(0, 9)]
+        for values, sigs in ((row, row_sigs), (col, col_sigs)):
+            groups = sorted(sum(1 for v in values[g:g + 3] if v) for g in (0, 3, 6))
+            sigs.append((tuple(groups), tuple(sorted(freq[v] for v in values if v))))
+
+    # for each orientation: the sorted signatures and the line orders producing them
+    orientations = []
+    for transposed, (first, second) in ((False, (row_sigs, col_sigs)), (True, (col_sigs, row_sigs))):
+        first_key, first_count, first_orders = _line_orders(first)
+        second_key, second_count, second_orders = _line_orders(second)
+        orientations.append(((first_key, second_key), first_count * second_count, transposed, first_orders, second_orders))
+    best_key = min(o[0] for o in orientations)
+    orientations = [o for o in orientations if o[0] == best_key]
+    if(sum(o[1] for o in orientations) > CANONICAL_LIMIT):
+        return None
+
+    best = None
+    for key, count, transposed, row_orders, col_orders in orientations:
+        col_orders = col_orders()
+        for rows in row_orders():
+            for cols in col_orders:
+                if(transposed):
+                    index_map = [j * 9 + i for i in rows for j in cols]
+                else:
+                    index_map = [i * 9 + j for i in rows for j in cols]
+                relabel = [0] * 10
+                label = 1
+                out = bytearray(CELLS)
+                for k, p in enumerate(index_map):
+                    v = cells[p]
+                    if(v):
+                        if(not relabel[v]):
+                            relabel[v] = label
+                            label += 1
+                        out[k] = relabel[v]
+                if(best is None or out < best[0]):
+                    best = (out, index_map, relabel, label)
+
+    out, index_map, relabel, label = best
+    # digits missing from the puzzle take the remaining labels in order
+    for v in range(1, 10):
+        if(not relabel[v]):
+            relabel[v] = label
+            label += 1
+    return bytes(out), (index_map, bytes(relabel))
+
+class SolutionCache:
+    """
+    This class caches the solutions of the puzzles by canonical form, so a puzzle already seen, even
+    relabeled, transposed or with swapped rows, columns, bands or stacks, is solved by mapping the cached
+    solution back. The first tier is an LRU dictionary in memory, the optional second tier a SQLite file
+    from which the least recently used entries are evicted
+    """
+    def __init__(self, maxsize=4096, path=None, disk_maxsize=1000000):
+        """
+        SolutionCache constructor
+        :param maxsize: int -> entries kept in memory
+        :param path: string or None -> SQLite file of the second tier
+        :param disk_maxsize: int -> entries kept in the SQLite file
+        :return: None
+        """
+        self.maxsize = maxsize
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        self.disk_maxsize = disk_maxsize
+        self.pending_writes = 0
+
+        if(path is not None):
+            import sqlite3
+            self.db = sqlite3.connect(path)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('CREATE TABLE IF NOT EXISTS solutions (puzzle BLOB PRIMARY KEY, solution BLOB NOT NULL, used REAL NOT NULL)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)')
+            self.disk_count = self.db.execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
+
+    def _get(self, canonical):
+        """
+        Looks the canonical puzzle up in memory and then on disk
+        :param canonical: bytes
+        :return: bytes or None -> canonical solution (empty if the puzzle has no solution)
+        """
+        solution = self.memory.get(canonical)
+        if(solution is not None):
+            self.memory.move_to_end(canonical)
+            return solution
+
+        if(self.db is not None):
+            row = self.db.execute('SELECT solution FROM solutions WHERE puzzle = ?', (canonical,)).fetchone()
+            if(row is not None):
+                self.db.execute('UPDATE solutions SET used = ? WHERE puzzle = ?', (time.time(), canonical))
+                self._written()
+                self._remember(canonical, row[0])
+                return row[0]
+        return None
+
+    def _remember(self, canonical, solution):
+        """
+        Stores an entry in the memory tier, evicting the least recently used one when full
+        :param canonical: bytes
+        :param solution: bytes
+        :return: None
+        """
+        self.memory[canonical] = solution
+        self.memory.move_to_end(canonical)
+        if(len(self.memory) > self.maxsize):
+            self.memory.popitem(last=False)
+
+    def _put(self, canonical, solution):
+        """
+        Stores an entry in both tiers. When the file grows over disk_maxsize the oldest tenth is evicted
+        :param canonical: bytes
+        :param solution: bytes
+        :return: None
+        """
+        self._remember(canonical, solution)
+        if(self.db is None):
+            return
+
+        cursor = self.db.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?, ?)', (canonical, solution, time.time()))
+        self.disk_count += cursor.rowcount
+        if(self.disk_count > self.disk_maxsize):
+            evicted = self.disk_count - self.disk_maxsize + self.disk_maxsize // 10
+            self.db.execute('DELETE FROM solutions WHERE puzzle IN (SELECT puzzle FROM solutions ORDER BY used LIMIT ?)', (evicted,))
+            self.disk_count = self.db.execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
+        self._written()
+
+    def _written(self):
+        """
+        Commits the SQLite writes in batches
+        :return: None
+        """
+        self.pending_writes += 1
+        if(self.pending_writes >= 100):
+            self.db.commit()
+            self.pending_writes = 0
+
+    def lookup(self, board):
+        """
+        Looks a 9x9 puzzle up in the cache (boards of other sizes are never cached)
+        :param board: Board
+        :return: Board, False or None -> the solution, False if the puzzle is known to have none, None if the
+                 puzzle is not in the cache
+        """
+        if(board.dim != 9):
+            return None
+        canonical = canonical_form(board.cells)
+        if(canonical is None):
+            return None
+        canonical, (index_map, relabel) = canonical
+
+        solution = self._get(canonical)
+        if(solution is None):
+            self.misses += 1
+            return None
+        self.hits += 1
+        if(not solution):
             return False
 
-    # test 3x3 square
-    small_row = floor(row / 3) * 3
-    small_col = floor(col / 3) * 3
+        digit_of = [0] * 10
+        for v in range(1, 10):
+            digit_of[relabel[v]] = v
+        cells = bytearray(CELLS)
+        for k, p in enumerate(index_map):
+            cells[p] = digit_of[solution[k]]
+        return Board(cells)
 
-    for i in range(small_row, small_row + 3):
-        for j in range(small_col, small_col + 3):
-            if((i != row and j != col) and gr[i][j] == num):
-                return False
-    
+    def store(self, board, solution):
+        """
+        Stores the solution of a 9x9 puzzle (boards of other sizes are not stored)
+        :param board: Board
+        :param solution: Board or None if the puzzle has no solution
+        :return: None
+        """
+        if(board.dim != 9):
+            return
+        canonical = canonical_form(board.cells)
+        if(canonical is None):
+            return
+        canonical, (index_map, relabel) = canonical
+        if(solution is None):
+            self._put(canonical, b'')
+        else:
+            self._put(canonical, bytes(relabel[solution.cells[p]] for p in index_map))
+
+    def solve(self, gr, DIM, backend='bitmask', stats=None, timeout=None, max_nodes=None, cancel=None):
+        """
+        Same as solve(), answering from the cache when the puzzle, or one equivalent to it, was already solved.
+        Only the outcomes that do not depend on the budget (SOLVED and UNSOLVABLE) are stored; an answer from the
+        cache takes no node
+        :param gr: 2D list or Board
+        :param DIM: int
+        :param backend: string
+        :param stats: SolveStats
+        :param timeout: float or None -> s
+        :param max_nodes: int or None
+        :param cancel: object with an is_set() method or None
+        :return: SolveResult -> true if the grid has been solved; None if the grid has a wrong dimension
+        """
+        if(isinstance(gr, Board)):
+            board = gr
+        elif(DIM == 9 and check_dim(gr, DIM)):
+            try:
+                board = Board.from_grid(gr)
+            except ValueError:              # a value out of 0..DIM is not a digit of the grid
+                return SolveResult(INVALID, 0, 0.0, stats)
+        else:
+            return solve(gr, DIM, backend, stats, timeout, max_nodes, cancel)
+
+        start = time.perf_counter()
+        solution = self.lookup(board)
+        if(solution is None):
+            solution = board.copy()
+            result = solve(solution, DIM, backend, stats, timeout, max_nodes, cancel)
+            if(result is None):
+                return None
+            if(result.status == SOLVED or result.status == UNSOLVABLE):
+                self.store(board, solution if result else None)
+            if(not result):
+                return result
+        elif(not solution):
+            status = UNSOLVABLE if check_givens(board.cells, DIM) else INVALID
+            return SolveResult(status, 0, time.perf_counter() - start, stats)
+        else:
+            result = SolveResult(SOLVED, 0, time.perf_counter() - start, stats)
+
+        board.cells[:] = solution.cells
+        if(board is not gr):
+            for i in range(0, DIM):
+                gr[i][:] = solution.cells[i * DIM:(i + 1) * DIM]
+        return result
+
+    def close(self):
+        """
+        Writes the pending entries and closes the SQLite file
+        :return: None
+        """
+        if(self.db is not None):
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+def is_valid(gr, pos, num, stats=None):
+    """
+    Checks if a given number can be put in the pos (i, j) position of the grid, of any size
+    :param gr: 2D list
+    :param pos: (row, col)
+    :param num: int
+    :param stats: SolveStats or None -> counts the call
+    :return: bool
+    """
+    if(stats is not None):
+        stats.checks += 1
+    geo = geometry(len(gr))
+    for p in geo.peers[pos[0] * geo.dim + pos[1]]:
+        if(gr[geo.row_of[p]][geo.col_of[p]] == num):
+            return False
     return True
 
+BACKENDS = {
+    'bitmask': solve_bitmask,
+    'dlx': solve_dlx,
+}
@@ -3,18 +3,20 @@
 
     Author: Fabio Condomitti
 """
+import argparse
 import time
-import pygame
-import json
 
-from copy import deepcopy
-from solver import solve
+from game import DIM, Cell, Game
 from math import floor
-from random import randint
 
 WIDTH = 800
 HEIGHT = 940
-DIM = 9
+FPS = 60                          # frame cap while the user interacts, 0 for no cap
+POLL_TIME = 50                    # ms between checks of the solver worker while waiting for it
+SIZES = (4, 9, 16, 25)            # grid sizes the window can show
+VALUE_SIZE = 60                   # font size of the values in the cubes of a 9x9 grid, scaled for other sizes
+TEMP_SIZE = 35                    # font size of the temporary values in the cubes of a 9x9 grid
+MARK_SIZE = 20                    # font size of the pencil marks in the cubes of a 9x9 grid
 
 LINE_COLOR = (0, 0, 0)            # black
 BORDER_COLOR = (200, 0, 0)
@@ -24,15 +26,84 @@ GREEN_BUTTON_OFF = (163, 255, 231)
 GREEN_BUTTON_ON = (153, 255, 221)
 RED_BUTTON_OFF = (235, 0, 0)
 RED_BUTTON_ON = (255, 0, 0)
+BACKGROUND_COLOR = (255, 255, 255)
+LINES_KEY = (255, 0, 255)         # transparent color of the cached dividing lines
+FONT_NAME = 'Comic Sans MS'
+GIVEN_COLOR = (125, 125, 125)
+VALUE_COLOR = (0, 0, 0)
+TEMP_COLOR = (0, 15, 185)
+MARK_COLOR = (90, 90, 90)
+CORRECT_COLOR = (0, 200, 0)
+WRONG_COLOR = (200, 0, 0)
+LABEL_COLOR = (100, 100, 100)
 
-pygame.font.init()
+pygame = None                     # imported by load_pygame() when the GUI starts
 
+fonts = {}                        # font object for each size
+glyphs = {}                       # rendered text for each (text, size, color)
 
-class Cube:
+
+def load_pygame():
+    """
+    This function imports pygame and initializes its fonts, so that nothing of pygame is loaded until a window
+    is actually opened
+    :return: None
+    """
+    global pygame
+    if(pygame is None):
+        import pygame
+        pygame.font.init()
+
+
+def get_font(size):
+    """
+    This function returns the font of the given size, loading it only the first time
+    :param size: int
+    :return: pygame.font.Font
+    """
+    font = fonts.get(size)
+    if(font is None):
+        font = fonts[size] = pygame.font.SysFont(FONT_NAME, size)
+    return font
+
+
+def get_glyph(text, size, color):
+    """
+    This function returns the rendered text, rendering it only the first time
+    :param text: string
+    :param size: int
+    :param color: pygame color
+    :return: pygame.Surface
+    """
+    key = (text, size, color)
+    glyph = glyphs.get(key)
+    if(glyph is None):
+        glyph = glyphs[key] = get_font(size).render(text, 1, color)
+    return glyph
+
+
+def preload_glyphs(dim, size, temp_size, mark_size):
+    """
+    This function renders every value the cubes can show, so that no rendering happens during the game
+    :param dim: int -> highest value
+    :param size: int -> font size of the values
+    :param temp_size: int -> font size of the temporary values
+    :param mark_size: int -> font size of the pencil marks
+    :return: None
+    """
+    for n in range(1, dim + 1):
+        for color in (GIVEN_COLOR, VALUE_COLOR, CORRECT_COLOR, WRONG_COLOR):
+            get_glyph(str(n), size, color)
+        for color in (TEMP_COLOR, CORRECT_COLOR, WRONG_COLOR):
+            get_glyph(str(n), temp_size, color)
+        get_glyph(str(n), mark_size, MARK_COLOR)
+
+
+class Cube(Cell):
     """
     This class handles the basic cell needed to compose the whole grid
     """
-    def __init__(self, row, col, val, width, height):
+    def __init__(self, row, col, val, width, height, size=VALUE_SIZE, temp_size=TEMP_SIZE, mark_size=MARK_SIZE, box=3):
         """
         Cube constructor
         :param row: int
@@ -40,69 +111,90 @@ class Cube:
         :param val: int
         :param width: int
         :param height: int
+        :param size: int -> font size of the value
+        :param temp_size: int -> font size of the temporary value
+        :param mark_size: int -> font size of the pencil marks
+        :param box: int -> side of a box, the pencil marks are laid out on a box x box grid
         :return: None
         """
-        self.row = row
-        self.col = col
-        self.val = val
-        self.temp = 0                       # temporary value
-        self.is_grid = False                # immutable or can be changed during game
+        Cell.__init__(self, row, col, val)
         self.width = width                  # single cube width
         self.height = height                # single cube height
-        self.selected = False               
-        self.help_cells_highlight = False   # to highlight horizontal, vertical and 3x3 around cells
-        self.same_number_highlight = False  # to highlight errors
-        self.same_number_exists = False     # to highlight other number with a given value
-        self.correct = 0                    # green in sudoku correctly solved, red otherwise
+        self.size = size
+        self.temp_size = temp_size
+        self.mark_size = mark_size
+        self.box = box
+        # area of the window covered by the cube, rounded so that the cubes tile the grid
+        x = round(self.row * self.width)
+        y = round(self.col * self.height)
+        self.rect = pygame.Rect(x, y, round((self.row + 1) * self.width) - x, round((self.col + 1) * self.height) - y)
 
     def draw(self, win):
         """
-        Cube constructor
+        This function draws the cube over its area of the window
         :param win: pygame window
-        :return: None
+        :return: pygame.Rect -> the area drawn
         """
-        size = 60
+        size = self.size
         x = self.row * self.width
         y = self.col * self.height
         s = ''
-        color = (0, 15, 185)
-        pos_x = x + self.width/2 - 12
-        pos_y = y + self.height/2 - 15
+        color = TEMP_COLOR
+        centered = True
 
         if(self.is_grid):
-            color = (125, 125, 125)
+            color = GIVEN_COLOR
             s = self.val
         elif(self.val != 0):
-            color = (0, 0, 0)
+            color = VALUE_COLOR
             s = self.val
         elif(self.temp != 0):
-            size = 35
+            size = self.temp_size
             s = self.temp
-            pos_x = x + 5
-            pos_y = y + 5
+            centered = False
             
         # color the cell based on the game state during game
+        background = BACKGROUND_COLOR
         if(self.selected):
-            pygame.draw.rect(win, (204, 255, 255), (x, y, self.width, self.height))
+            background = (204, 255, 255)
         elif(self.same_number_exists):
-            pygame.draw.rect(win, (225, 168, 168), (x, y, self.width + 2, self.height + 2))
+            background = (225, 168, 168)
         elif(self.help_cells_highlight):
-            pygame.draw.rect(win, (235, 235, 235), (x, y, self.width, self.height))
+            background = (235, 235, 235)
         elif(self.same_number_highlight):
-            pygame.draw.rect(win, (225, 225, 250), (x, y, self.width, self.height))
+            background = (225, 225, 250)
+        win.fill(background, self.rect)
         
         # color the cell text at the end of the game
         if(self.correct == 1):
-            color = (0, 200, 0)
+            color = CORRECT_COLOR
         elif(self.correct == 2):
-            color = (200, 0, 0)
-
-        font = pygame.font.SysFont('Comic Sans MS', size)
-        string = font.render(str(s), 1, color)
-        win.blit(string, (pos_x, pos_y))
-
-
-class Grid:
+            color = WRONG_COLOR
+
+        if(s != ''):
+            glyph = get_glyph(str(s), size, color)
+            if(centered):
+                pos_x = x + (self.width - glyph.get_width()) / 2
+                pos_y = y + (self.height - glyph.get_height()) / 2
+            else:                           # temporary values stay in the top left corner
+                pos_x = x + 5
+                pos_y = y + 5
+            win.blit(glyph, (pos_x, pos_y), (0, 0, self.rect.right - pos_x, self.rect.bottom - pos_y))
+        elif(self.marks):                   # each candidate has its own place in the cube, like digit d on a keypad
+            mask = self.marks
+            while(mask):
+                bit = mask & -mask
+                mask ^= bit
+                d = bit.bit_length() - 1
+                glyph = get_glyph(str(d + 1), self.mark_size, MARK_COLOR)
+                pos_x = x + (d % self.box + 0.5) * self.width / self.box - glyph.get_width() / 2
+                pos_y = y + (d // self.box + 0.5) * self.height / self.box - glyph.get_height() / 2
+                win.blit(glyph, (pos_x, pos_y))
+        self.dirty = False
+        return self.rect
+
+
+class Grid(Game):
     """
     This class handles the the whole grid
     """
@@ -117,220 +209,25 @@ class Grid:
         :return: None
         """
         self.win = win
-        self.row = row
-        self.col = col
         self.width = width
         self.height = height
-        self.selected = None
-
-        single_width = self.width / self.row        # dimension of each 1x1 cell
-        single_height  = self.height / self.col
-        self.cubes = [[Cube(i, j, 0, single_width, single_height) for j in range(self.col)] for i in range(self.row)]
-
-    def reset(self):
-        """
-        This function reset the temporary and the final values of every cell to play a game with the same grid
-        :return: None
-        """
-        for i in range(0, self.row):
-            for j in range(0, self.col):
-                if(not self.cubes[i][j].is_grid):
-                    self.cubes[i][j].temp = 0
-                    self.cubes[i][j].val = 0
-                self.cubes[j][i].correct = 0
-    
-    def new_game(self):
-        """
-        This function clear the status to play another game with a new grid
-        :return: None
-        """
-        for i in range(0, self.row):
-            for j in range(0, self.col):
-                    self.cubes[i][j].temp = 0
-                    self.cubes[i][j].val = 0
-                    self.cubes[i][j].is_grid = False
-                    self.cubes[i][j].selected = False
-                    self.cubes[j][i].correct = False
-        self.selected = None
-    
-    def fix_grid(self):
-        """
-        This function fix the grid allowing the user to create a personal sudoku with an immutable grid
-        :return: None
-        """
-        gr = []
-        for i in range(0, self.row):
-            temp = []
-            for j in range(0, self.col):
-                if(self.cubes[i][j].val != 0):
-                    self.cubes[i][j].is_grid = True
-                    self.cubes[i][j].color = (100, 100, 100)
-                temp.append(self.cubes[i][j].val)
-            gr.append(temp)
-
-    def de_highlight(self):
-        """
-        This function removes the cells highlight that helps the user
-        :return: None
-        """
-        for i in range(0, self.row):
-            for j in range(0, self.col):
-                self.cubes[i][j].same_number_highlight = False
-                self.cubes[i][j].same_number_exists = False
-    
-    def highlight(self):
-        """
-        This function based on the currently selected value highlight cells to help the user
-        :return: None
-        """
-        row, col = self.selected
-        val = self.cubes[row][col].val
-
-        # highlights other cell with the same value of the selected one and clears the state of the cells
-        for i in range(0, self.row):
-            for j in range(0, self.col):
-                if(self.cubes[i][j].val == val and val != 0):
-                    self.cubes[i][j].same_number_highlight = True
-                else:
-                    self.cubes[i][j].same_number_highlight = False
-                self.cubes[i][j].help_cells_highlight = False
-                self.cubes[i][j].same_number_exists = False
-
-        for j in range(0, self.row):
-            # highlights cells in the same row
-            if(j != col):
-                if(self.cubes[row][j].val == val and val != 0):
-                    self.cubes[row][j].same_number_exists = True
-                self.cubes[row][j].help_cells_highlight = True
-            # highlights cells in the same col
-            if(j != row):
-                if(self.cubes[j][col].val == val and val != 0):
-                    self.cubes[j][col].same_number_exists = True
-                self.cubes[j][col].help_cells_highlight = True
-
-        # highlights cell in the 3x3 square around the selected cell
-        small_row = floor(row / 3) * 3
-        small_col = floor(col / 3) * 3
-        
-        for i in range(small_row, small_row + 3):
-            for j in range(small_col, small_col + 3):
-                self.cubes[i][j].help_cells_highlight = True
-                if(self.cubes[i][j].val == val and val != 0):
-                    self.cubes[i][j].same_number_exists = True
-                else:
-                    self.cubes[i][j].same_number_exists = False
-
-    def set_temp(self, k):
-        """
-        This function modifies the temporary value of modifiable cells
-        :param k: int
-        :return: None
-        """
-        if(self.selected):
-            i = self.selected[0]
-            j = self.selected[1]
-            if(not self.cubes[i][j].is_grid):
-                self.cubes[i][j].temp = k
-                self.cubes[i][j].val = 0
-    
-    def set_val(self, k):
-        """
-        This function modifies the value of modifiable cells or makes the temporary become actual
-        :param k: int
-        :return: int
-        """
-        if(self.selected):
-            i, j = self.selected
-            if(k == 0):
-                k = self.cubes[i][j].temp
-            self.cubes[i][j].val = k
-            self.highlight()
-        return k
-    
-    def select(self, ii, jj):
-        """
-        This function sets the clicked cell as selected and updates the status
-        :param ii: int
-        :param jj: int
-        :return: None
-        """
-        # clear the status
-        for i in range(0, self.row):
-            for j in range(0, self.col):
-                self.cubes[i][j].selected = False
-
-        self.cubes[ii][jj].selected = True
-        self.selected = (ii, jj)
-        self.highlight()                    # to help the user with the highlight
-    
-    def random(self):
-        """
-        This function uses a json file to load a random sudoku game
-        :return: None
-        """
-        with open('grids.json', 'r') as f:
-            data = json.load(f)
-        i = str(randint(0, len(data.keys()) - 1))
-        sudoku_grid = data[i]
-        for i in range(len(sudoku_grid)):
-            for j in range(len(sudoku_grid[0])):
-                self.cubes[i][j].val = sudoku_grid[j][i]
-        self.fix_grid()
-
-    def check_solution(self):
-        """
-        This function checks if the user solution is the correct one
-        :return: bool
-        """
-        start_grid = []
-        grid = []
-        # creates a list for the full user grid and a list of the fixed grid
-        for i in range(0, self.row):
-            start_temp = []
-            temp = []
-            for j in range(0, self.col):
-                temp.append(self.cubes[j][i].val)
-                if(self.cubes[j][i].is_grid):
-                    start_temp.append(self.cubes[j][i].val)
-                else:
-                    start_temp.append(0)
-            grid.append(temp)
-            start_grid.append(start_temp)
-        
-        corrected_grid = deepcopy(start_grid)
-        solve(corrected_grid, DIM)
+        self.lines = None                           # dividing lines, drawn once on a transparent surface
+        self.size = round(VALUE_SIZE * DIM / row)   # font sizes scaled to the size of the cubes
+        self.temp_size = round(TEMP_SIZE * DIM / row)
+        self.mark_size = round(MARK_SIZE * DIM / row)
+        Game.__init__(self, row, col)
+        if(row == DIM and not self.get_store()):
+            self.get_puzzles()                      # without a puzzle store the Random button needs generated puzzles
 
-        # compare the correct solution with the user one
-        correct = True
-        for i in range(0, self.row):
-            for j in range(0, self.col):
-                if(corrected_grid[i][j] != grid[i][j]):
-                    correct = False
-        
-        if(correct):
-            result = 1
-            print("Sudoku solved!")
-        else:
-            result = 2
-            print('Sudoku not solved. Restart it')
-
-        # sets the bool to color the final stage
-        for i in range(0, self.row):
-            for j in range(0, self.col):
-                self.cubes[j][i].correct = result
-        return correct
-
-    def count_free_cubes(self):
+    def new_cell(self, i, j):
         """
-        This function counts how many cells have a value: if all do, then the grid is full and we can check the result
-        :return: int
+        This function creates the cube in position (i, j)
+        :param i: int
+        :param j: int
+        :return: Cube
         """
-        count = DIM * DIM
-        for i in range(0, self.row):
-            for j in range(0, self.col):
-                if(self.cubes[i][j].val != 0):
-                    count -= 1
-        return count
+        return Cube(i, j, 0, self.width / self.row, self.height / self.col, self.size, self.temp_size, self.mark_size,
+                    self.geo.box)
 
     def get_clicked_cube(self, mouse_pos):
         """
@@ -346,29 +243,47 @@ class Grid:
 
         return (i, j)
 
-    def draw(self):
+    def draw_lines(self):
         """
-        This function draws both the grid and the dividing lines to compose the sudoku
-        :return: None
+        This function draws the dividing lines of the sudoku on a transparent surface as big as the window
+        :return: pygame.Surface
         """
-        # draw grid
-        for i in range(0, self.row):
-            for j in range(0, self.col):
-                self.cubes[i][j].draw(self.win)        
-
-        # draw lines
+        lines = pygame.Surface(self.win.get_size())
+        lines.fill(LINES_KEY)
+        lines.set_colorkey(LINES_KEY)
         space = self.width / self.row
         
         for i in range(0, self.row):
-            for j in range(0, self.col):
-                if(i % 3 == 0):
-                    thickness = 4
-                else:
-                    thickness = 1
-                pygame.draw.line(self.win, LINE_COLOR, (0, i * space), (self.width, i * space), thickness)
-                pygame.draw.line(self.win, LINE_COLOR, (i * space, 0), (i * space, self.height), thickness)
+            if(i % self.geo.box == 0):
+                thickness = 4
+            else:
+                thickness = 1
+            pygame.draw.line(lines, LINE_COLOR, (0, i * space), (self.width, i * space), thickness)
+            pygame.draw.line(lines, LINE_COLOR, (i * space, 0), (i * space, self.height), thickness)
         # draw final border to separate grid from user panel
-        pygame.draw.line(self.win, BORDER_COLOR, (0, 9 * space), (self.width, 9 * space), 5)
+        pygame.draw.line(lines, BORDER_COLOR, (0, self.row * space), (self.width, self.row * space), 5)
+        return lines
+
+    def invalidate(self):
+        """
+        This function marks every cube to be drawn again
+        :return: None
+        """
+        for cube in self.flat_cubes:
+            cube.dirty = True
+
+    def draw(self):
+        """
+        This function draws again only the cubes whose look changed, then the dividing lines over them
+        :return: list of pygame.Rect -> the areas of the window that changed
+        """
+        if(self.lines is None):
+            self.lines = self.draw_lines()
+
+        rects = [cube.draw(self.win) for cube in self.flat_cubes if cube.dirty]
+        for rect in rects:
+            self.win.blit(self.lines, rect, rect)
+        return rects
 
 def get_formatted_time(s):
     """
@@ -405,25 +320,50 @@ class Button:
         self.width = w
         self.height = h
         self.fun = f
+        self.rect = pygame.Rect(self.x - 2, self.y - 2, self.width + 4, self.height + 4)
+        self.surfaces = {}          # the button already drawn for each (color, outline)
 
-    def draw(self, win, outline=None):
+    def render(self, color, outline=None):
         """
-        This function draws the button and the text inside it
-        :param win: pygame window
+        This function draws the button and the text inside it on a surface of its own
+        :param color: pygame color
         :param outlin: bool
-        :return: None
+        :return: pygame.Surface
         """
+        surface = pygame.Surface(self.rect.size)
+        surface.fill(BACKGROUND_COLOR)
         if(outline):
-            pygame.draw.rect(win, outline, (self.x - 2, self.y - 2, self.width + 4, self.height + 4), 0)
+            pygame.draw.rect(surface, outline, (0, 0, self.width + 4, self.height + 4), 0)
 
-        pygame.draw.rect(win, self.color, (self.x, self.y, self.width, self.height), 0)
+        pygame.draw.rect(surface, color, (2, 2, self.width, self.height), 0)
 
         if(self.text != ''):
-            button_font = pygame.font.SysFont('Comic Sans MS', 45)
-            text = button_font.render(str(self.text), 1, (100, 100, 100))
-            pygame.draw.rect(win, self.color, (self.x,self.y,self.width,self.height), 0)
-            
-            win.blit(text, (self.x + (self.width/2 - text.get_width()/2), self.y + (self.height/2 - text.get_height()/2)))
+            text = get_glyph(str(self.text), 45, LABEL_COLOR)
+            surface.blit(text, (2 + (self.width/2 - text.get_width()/2), 2 + (self.height/2 - text.get_height()/2)))
+        return surface
+
+    def preload(self, outline=None):
+        """
+        This function renders the button in both its colors
+        :param outlin: bool
+        :return: None
+        """
+        for color in self.color_list:
+            self.surfaces[(color, outline)] = self.render(color, outline)
+
+    def draw(self, win, outline=None):
+        """
+        This function draws the button, rendering it only the first time it is shown with the current color
+        :param win: pygame window
+        :param outlin: bool
+        :return: pygame.Rect -> the area drawn
+        """
+        key = (self.color, outline)
+        if(key not in self.surfaces):
+            self.surfaces[key] = self.render(self.color, outline)
+        win.blit(self.surfaces[key], self.rect)
+        self.drawn = key
+        return self.rect
 
     def is_over(self, pos):
         """
@@ -445,29 +385,44 @@ class Sudoku_GUI:
     """
     This class handles the whole sudoku game and the user interactions
     """
-    def __init__(self, width, height):
+    def __init__(self, width, height, fps=FPS, dim=DIM):
         """
         Sudoku GUI constructor
         :param width: int
         :param height: int
+        :param fps: int -> frame cap, 0 for no cap
+        :param dim: int -> side of the grid
         :return: None
         """
+        load_pygame()
         self.width = width
         self.height = height
         self.win = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption('Sudoku Solver')
-        self.grid = Grid(self.win, self.width, self.width, DIM, DIM)
+        self.grid = Grid(self.win, self.width, self.width, dim, dim)
         self.started = False
         self.finished = False
-        self.moves_list = []
-        self.moves_index = 0
+        self.full_redraw = True         # the whole window must be drawn again
+        self.panel = {}                 # text drawn in the panel and its area, for each panel item
+        self.drawn_buttons = []
+        self.fps = fps
+        self.clock = pygame.time.Clock()
+        self.typed = None               # (cell, digit) typed first, it can start a two digits value
 
         # buttons creation
         new_btn = Button(BLUE_BUTTON_OFF, BLUE_BUTTON_ON, 20, self.height - 105, 170, 70, f=self.grid.new_game, text='New game')
         random_btn = Button(GREEN_BUTTON_OFF, GREEN_BUTTON_ON, 220, self.height - 105, 190, 70, f=self.grid.random, text='Random')
         reset_btn = Button(GREEN_BUTTON_OFF, GREEN_BUTTON_ON, 220, self.height - 105, 190, 70, f=self.grid.reset, text='Restart')
         start_btn = Button(BLUE_BUTTON_OFF, BLUE_BUTTON_ON, 20, self.height - 105, 170, 70, f=self.grid.fix_grid, text='Start game')
-        self.b = [new_btn, reset_btn, random_btn, start_btn]
+        self.game_buttons = [new_btn, reset_btn]
+        # random puzzles are only generated for 9x9 grids
+        self.setup_buttons = [random_btn, start_btn] if dim == DIM else [start_btn]
+        self.b = self.game_buttons + self.setup_buttons
+
+        # render values and buttons once, before the game starts
+        preload_glyphs(dim, self.grid.size, self.grid.temp_size, self.grid.mark_size)
+        for b in self.b:
+            b.preload(1)
 
         # start the game loop
         self.execute()
@@ -479,25 +434,32 @@ class Sudoku_GUI:
         :return: int
         """
         key = 0
+        digit = None
         # int to insert numbers
+        if(event.key == pygame.K_0 or event.key == pygame.K_KP0):
+            digit = 0
         if(event.key == pygame.K_1 or event.key == pygame.K_KP1):
-            key = 1
+            digit = 1
         if(event.key == pygame.K_2 or event.key == pygame.K_KP2):
-            key = 2
+            digit = 2
         if(event.key == pygame.K_3 or event.key == pygame.K_KP3):
-            key = 3
+            digit = 3
         if(event.key == pygame.K_4 or event.key == pygame.K_KP4):
-            key = 4
+            digit = 4
         if(event.key == pygame.K_5 or event.key == pygame.K_KP5):
-            key = 5
+            digit = 5
         if(event.key == pygame.K_6 or event.key == pygame.K_KP6):
-            key = 6
+            digit = 6
         if(event.key == pygame.K_7 or event.key == pygame.K_KP7):
-            key = 7
+            digit = 7
         if(event.key == pygame.K_8 or event.key == pygame.K_KP8):
-            key = 8
+            digit = 8
         if(event.key == pygame.K_9 or event.key == pygame.K_KP9):
-            key = 9
+            digit = 9
+        if(digit is None):
+            self.typed = None
+        else:
+            key = self.type_digit(digit)
 
         # checks if the user wants to delete the cell value if it is mutable
         if((event.key == pygame.K_DELETE or event.key == pygame.K_BACKSPACE) and not self.finished):
@@ -505,41 +467,37 @@ class Sudoku_GUI:
             if(not self.grid.cubes[i][j].is_grid):
                 self.grid.set_val(0)
             self.grid.set_temp(0)
-            self.grid.de_highlight()
             self.grid.highlight()
 
         # checks if the user presses Ctrl+Z to undo the insertions
         if(self.started and not self.finished):
             if(event.key == pygame.K_z and (pygame.key.get_mods() & pygame.KMOD_CTRL)):
-                self.move_backward()
+                self.grid.undo()
+            # H shows the next logical step, P shows or hides the pencil marks
+            if(event.key == pygame.K_h):
+                self.grid.hint()
+            if(event.key == pygame.K_p):
+                self.grid.set_marks(not self.grid.show_marks)
 
         return key
-    
-    def move_backward(self):
-        """
-        This function performs the sudoku-state undo when the user presses Ctrl+Z
-        :return: None
-        """
-        if(not self.moves_list):        # no states available. State = [(i, j), val] -> val inserted in cell (i, j)
-            return
-        
-        self.moves_index -= 1           # index to move inside the states-list
-        
-        if(self.moves_index < 0):
-            self.moves_index = 0
-            return
-        (i, j), val = self.moves_list[self.moves_index]
-        
-        self.grid.cubes[i][j].val = 0
-        if(not self.grid.cubes[i][j].is_grid):
-            self.grid.cubes[i][j].temp = 0
-        
-        # remove the last element
-        self.moves_list.pop()
-        # de-highlights and the highlights based on the current user selection
-        self.grid.de_highlight()
-        self.grid.highlight()
 
+    def type_digit(self, digit):
+        """
+        This function turns the digits typed by the user into a value: on grids larger than 9x9 a digit typed
+        right after another one in the same cell completes a two digits value (1 then 6 -> 16)
+        :param digit: int
+        :return: int -> the value, 0 if it does not fit the grid
+        """
+        first = self.typed
+        self.typed = None
+        if(first is not None and first[0] == self.grid.selected and first[1] * 10 + digit <= self.grid.row):
+            return first[1] * 10 + digit
+        if(digit != 0 and digit * 10 <= self.grid.row):
+            self.typed = (self.grid.selected, digit)
+        if(digit > self.grid.row):
+            return 0
+        return digit
+    
     def move_cursor(self, key, event):
         """
         This function moves the selected cell according to the arrow keys pressed by the user and returns the value
@@ -574,7 +532,7 @@ class Sudoku_GUI:
             key = 0
             self.grid.select(i, j)
         
-        if(not self.started):
+        if(not self.started and key == 0):      # keys that are not values leave the cell as it is
             i = self.grid.selected[0]
             j = self.grid.selected[1]
             if(self.grid.cubes[i][j].val != 0):
@@ -591,18 +549,24 @@ class Sudoku_GUI:
         self.playing_time = 0
 
         while(self.run):
-            clock = pygame.time.Clock()
-            clock.tick(60)
-
             # starts the timer and shows different button combinations depending on the game is started or not yet
             if(self.started):
                 if(not self.finished):
                     self.playing_time = time.time() - start
-                self.buttons = self.b[:-2]
+                self.buttons = self.game_buttons
             else:
                 self.playing_time = 0
-                self.buttons = self.b[-2:]
+                self.buttons = self.setup_buttons
+
+            # collects the solution of the fixed grid as soon as the worker has it
+            self.grid.poll_solution()
 
+            rects = self.draw()
+            if(rects):
+                pygame.display.update(rects)
+            self.clock.tick(self.fps)
+
+            events = self.next_events()
             pos = pygame.mouse.get_pos()
 
             if(self.grid.selected):
@@ -611,10 +575,13 @@ class Sudoku_GUI:
             else:
                 key = 0
             
-            for event in pygame.event.get():
+            for event in events:
                 if(event.type == pygame.QUIT):
                     self.run = False
 
+                if(event.type == pygame.VIDEOEXPOSE):
+                    self.full_redraw = True
+
                 if(event.type == pygame.KEYDOWN):
                     key = self.handle_key_press(event)    # handle numbers
                     
@@ -628,16 +595,10 @@ class Sudoku_GUI:
                             self.grid.set_temp(key)         # user sets the temporary value first
                             
                         if(event.key == pygame.K_RETURN):   # temp val becomes fixed after RETURN only
-                            if(self.grid.cubes[i][j].val != 0):
-                                key = self.grid.cubes[i][j].val
-
-                            v = self.grid.set_val(key)
-                            self.moves_list.append([(i, j), v]) # to save the state changes and perform the undo
-                            self.moves_index += 1               # index for the undo operation
+                            self.grid.play(key)             # saves the state change to perform the undo
 
                             if(self.grid.count_free_cubes() == 0):  # the last RETURN completed the whole grid -> check the result
-                                if(self.grid.check_solution()):
-                                    self.finished = True
+                                self.finished = self.grid.check_solution()
                     
                 if(event.type == pygame.MOUSEMOTION):               # changes the button color when the mouse is over it
                     for b in self.buttons:
@@ -650,52 +611,139 @@ class Sudoku_GUI:
                     if(pos[1] > WIDTH):     # check button click
                         for b in self.buttons:
                             if(b.is_over(pos)[0]):
-                                b.fun()
+                                done = b.fun()
                                 # reset the state and the timer depending on the clicked button 
                                 if(b.is_over(pos)[1] == 'New game'):
                                     self.started = False
                                     self.finished = False
-                                    self.moves_index = 0
-                                    self.moves_list = []
-                                elif(b.is_over(pos)[1] == 'Start game' or b.is_over(pos)[1] == 'Random'):
+                                elif((b.is_over(pos)[1] == 'Start game' and done) or b.is_over(pos)[1] == 'Random'):
                                     self.started = True
                                     self.finished = False
                                     start = time.time()
-                                    self.moves_index = 0
-                                    self.moves_list = []
                                 elif(b.is_over(pos)[1] == 'Restart' or b.is_over(pos)[1] == 'Solve'):
                                     start = time.time()
                                     self.finished = False
-                                    self.moves_index = 0
-                                    self.moves_list = []
                                     
                     else:                   # check grid click
                         i, j = self.grid.get_clicked_cube(pos)
                         self.grid.select(i, j)
 
-            self.draw()
-            pygame.display.update()
-
+        self.grid.close()
         pygame.quit()
 
+    def idle_timeout(self):
+        """
+        This function returns how long the game can sleep waiting for events: until the displayed second changes
+        while playing, shortly while the worker is computing the solution or checking the values, forever otherwise
+        :return: int -> ms, None to wait forever
+        """
+        if(self.grid.waiting()):
+            return POLL_TIME
+        if(self.started and not self.finished):
+            return 1000 - int(self.playing_time * 1000) % 1000
+        return None
+
+    def next_events(self):
+        """
+        This function returns the pending events, sleeping until the next one if there is none and nothing changes
+        on its own in the meantime
+        :return: list of pygame events
+        """
+        events = pygame.event.get()
+        if(not events):
+            timeout = self.idle_timeout()
+            if(timeout is None):
+                event = pygame.event.wait()
+            else:
+                event = pygame.event.wait(timeout)
+            if(event.type != pygame.NOEVENT):
+                events = [event] + pygame.event.get()
+        return events
+
+    def draw_text(self, name, text, size, color, pos):
+        """
+        This function draws a text of the panel if it changed since the last frame, erasing the previous one
+        :param name: string -> panel item
+        :param text: string
+        :param size: int
+        :param color: pygame color
+        :param pos: (x, y)
+        :return: list of pygame.Rect -> the areas of the window that changed
+        """
+        old_text, old_rect = self.panel.get(name, (None, None))
+        if(text == old_text):
+            return []
+
+        rects = []
+        if(old_rect):
+            self.win.fill(BACKGROUND_COLOR, old_rect)
+            rects.append(old_rect)
+        rect = None
+        if(text):
+            rect = self.win.blit(get_font(size).render(text, 1, color), pos)
+            rects.append(rect)
+        self.panel[name] = (text, rect)
+        return rects
+
     def draw(self):
         """
-        This function calls the draw() of each object involved in the game
-        :return: None
+        This function calls the draw() of each object involved in the game, drawing again only what changed
+        :return: list of pygame.Rect -> the areas of the window that changed
         """
-        self.win.fill((255,255,255))
-        # draw the sudoku grid
-        self.grid.draw()
-        space = self.width / DIM
+        if(self.full_redraw):
+            self.win.fill(BACKGROUND_COLOR)
+            self.grid.invalidate()
+            self.panel = {}
+            self.drawn_buttons = []
 
-        # draw the timer value
-        font = pygame.font.SysFont('Comic Sans MS', 45)
-        string = font.render('Elapsed time:  ' + get_formatted_time(self.playing_time), 1, (51, 153, 255))
-        self.win.blit(string, (self.width / 2 + 80, 9 * space + 55))
+        # draw the sudoku grid
+        rects = self.grid.draw()
+        space = self.width / self.grid.row
+
+        # the texts of the panel lie in rows of their own: a text erased when it changes never clears another one
+        stats_y = self.grid.row * space + 8
+        solving_y = stats_y + get_font(22).get_linesize()
+        timer_y = solving_y + get_font(30).get_linesize()
+
+        # draw the timer value, rendered again only when the displayed second changes
+        rects += self.draw_text('timer', 'Elapsed time:  ' + get_formatted_time(self.playing_time), 45, (51, 153, 255),
+                                (self.width / 2 + 80, timer_y))
+
+        # show how hard the grid was for the solver once the user grid has been checked, the last hint before
+        stats = self.grid.stats
+        text = self.grid.hint_text
+        if(self.grid.checked and stats is not None):
+            text = 'Solver: {0} placements, {1} guesses, {2} backtracks, depth {3}, {4:.1f} ms'.format(
+                stats.placements, stats.guesses, stats.backtracks, stats.max_depth,
+                (stats.setup_time + stats.search_time) * 1e3)
+        rects += self.draw_text('stats', text, 22, GIVEN_COLOR, (20, stats_y))
+
+        # tell the user that the solution is still being computed, or why the grid cannot be played
+        rects += self.draw_text('solving', 'Solving...' if self.grid.solving is not None else self.grid.error, 30, (125, 125, 125),
+                                (self.width / 2 + 80, solving_y))
+
+        # draw the buttons, all of them if the visible ones changed
+        if(self.drawn_buttons != self.buttons):
+            for b in self.drawn_buttons:
+                self.win.fill(BACKGROUND_COLOR, b.rect)
+                rects.append(b.rect)
+            for b in self.buttons:
+                rects.append(b.draw(self.win, 1))
+            self.drawn_buttons = list(self.buttons)
+        else:
+            for b in self.buttons:
+                if(b.drawn != (b.color, 1)):
+                    rects.append(b.draw(self.win, 1))
 
-        # draw the buttons
-        for b in self.buttons:
-            b.draw(self.win, 1)
+        if(self.full_redraw):
+            self.full_redraw = False
+            return [self.win.get_rect()]
+        return rects
 
         
-g = Sudoku_GUI(WIDTH, HEIGHT)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Sudoku GUI')
+    parser.add_argument('size', nargs='?', type=int, default=DIM, choices=SIZES,
+                        help='side of the grid (default: 9); on larger grids values above 9 are typed with two digits')
+    args = parser.parse_args()
+    g = Sudoku_GUI(WIDTH, HEIGHT, dim=args.size)